@@ -3,16 +3,22 @@
 Помогает понять структуру блоков "скважина" в вашем проекте.
 """
 
-import win32com.client
 import sys
 import os
+from itertools import groupby
 
-def diagnose_autocad_blocks(dwg_path=None):
+import pywintypes
+
+from diagnose_core import buffered_output, connect_autocad, is_borehole_name, scan
+
+def diagnose_autocad_blocks(dwg_path=None, skvazhina_only=False):
     """
     Диагностика блоков в AutoCAD документе.
 
     Args:
         dwg_path: Путь к .dwg файлу (опционально)
+        skvazhina_only: Нужна только диагностика блоков "скважина" - при
+            отсутствии их определений ModelSpace не сканируется
     """
     try:
         # Подключение к AutoCAD
@@ -20,7 +26,7 @@ def diagnose_autocad_blocks(dwg_path=None):
         print("ДИАГНОСТИКА БЛОКОВ AUTOCAD")
         print("=" * 80)
 
-        acad = win32com.client.Dispatch("AutoCAD.Application")
+        acad = connect_autocad()
         print(f"✅ Подключено к AutoCAD версии: {acad.Version}")
 
         # Получаем список всех открытых документов
@@ -33,7 +39,7 @@ def diagnose_autocad_blocks(dwg_path=None):
                 documents.append(doc)
                 is_active = "✅ АКТИВНЫЙ" if doc == acad.ActiveDocument else ""
                 print(f"   {i+1}. {doc.Name} {is_active}")
-        except:
+        except (pywintypes.com_error, AttributeError):
             # Если Documents не работает, пытаемся через ActiveDocument
             try:
                 doc = acad.ActiveDocument
@@ -67,132 +73,80 @@ def diagnose_autocad_blocks(dwg_path=None):
         print("АНАЛИЗ БЛОКОВ В MODELSPACE")
         print("=" * 80)
 
-        # Статистика
-        total_entities = 0
-        block_references = 0
-        blocks_by_name = {}
-        blocks_by_layer = {}
-        blocks_with_attributes = 0
-        sample_blocks = []
-
-        # Проходим по всем объектам
-        for entity in doc.ModelSpace:
-            total_entities += 1
-
-            if entity.EntityName == 'AcDbBlockReference':
-                block_references += 1
-
-                # Получаем информацию о блоке
-                block_name = getattr(entity, 'Name', 'Unknown')
-                effective_name = getattr(entity, 'EffectiveName', block_name)
-                layer = getattr(entity, 'Layer', 'Unknown')
-                has_attributes = getattr(entity, 'HasAttributes', False)
-
-                # Статистика по именам
-                if effective_name not in blocks_by_name:
-                    blocks_by_name[effective_name] = 0
-                blocks_by_name[effective_name] += 1
-
-                # Статистика по слоям
-                if layer not in blocks_by_layer:
-                    blocks_by_layer[layer] = []
-                blocks_by_layer[layer].append(effective_name)
-
-                # Считаем блоки с атрибутами
-                if has_attributes:
-                    blocks_with_attributes += 1
-
-                # Собираем примеры блоков "скважина"
-                if 'скважина' in effective_name.lower() and len(sample_blocks) < 5:
-                    insertion_point = entity.InsertionPoint
-
-                    attributes_info = {}
-                    if has_attributes:
-                        try:
-                            attrs = entity.GetAttributes()
-                            for attr in attrs:
-                                tag = getattr(attr, 'TagString', '')
-                                value = getattr(attr, 'TextString', '')
-                                attributes_info[tag] = value
-                        except Exception as e:
-                            attributes_info = {"error": str(e)}
-
-                    sample_blocks.append({
-                        'name': effective_name,
-                        'layer': layer,
-                        'position': (insertion_point[0], insertion_point[1], insertion_point[2]),
-                        'has_attributes': has_attributes,
-                        'attributes': attributes_info
-                    })
-
-            # Прогресс каждые 10000 объектов
-            if total_entities % 10000 == 0:
-                print(f"Обработано {total_entities} объектов...")
-
-        # Выводим результаты
-        print(f"\n📊 ОБЩАЯ СТАТИСТИКА:")
-        print(f"   Всего объектов: {total_entities}")
-        print(f"   Блоков (AcDbBlockReference): {block_references}")
-        print(f"   Блоков с атрибутами: {blocks_with_attributes}")
-
-        print(f"\n📦 ТИПЫ БЛОКОВ (топ-20):")
-        sorted_blocks = sorted(blocks_by_name.items(), key=lambda x: x[1], reverse=True)
-        for name, count in sorted_blocks[:20]:
-            marker = "⭐" if 'скважина' in name.lower() else "  "
-            print(f"   {marker} '{name}': {count} вставок")
-
-        print(f"\n🗂️ БЛОКИ ПО СЛОЯМ (только слои с 'СКВ'):")
-        for layer, block_names in sorted(blocks_by_layer.items()):
-            if 'СКВ' in layer.upper():
-                unique_blocks = set(block_names)
-                print(f"   Слой '{layer}':")
-                for block_name in unique_blocks:
-                    count = block_names.count(block_name)
-                    print(f"      - '{block_name}': {count} вставок")
-
-        print(f"\n🔍 ПРИМЕРЫ БЛОКОВ 'СКВАЖИНА':")
-        if sample_blocks:
-            for i, block in enumerate(sample_blocks, 1):
-                print(f"\n   Пример #{i}:")
-                print(f"      Имя: {block['name']}")
-                print(f"      Слой: {block['layer']}")
-                print(f"      Позиция: ({block['position'][0]:.2f}, {block['position'][1]:.2f}, {block['position'][2]:.2f})")
-                print(f"      Есть атрибуты: {block['has_attributes']}")
-                if block['attributes']:
-                    print(f"      Атрибуты:")
-                    for tag, value in block['attributes'].items():
-                        print(f"         {tag}: {value}")
-        else:
-            print("   ⚠️ Не найдено блоков с именем 'скважина'")
-
-        print("\n" + "=" * 80)
-        print("РЕКОМЕНДАЦИИ:")
-        print("=" * 80)
-
-        # Анализ и рекомендации
-        skvazhina_blocks = {name: count for name, count in blocks_by_name.items()
-                           if 'скважина' in name.lower()}
-
-        if not skvazhina_blocks:
-            print("❌ Не найдено блоков с именем 'скважина'")
-            print("   Проверьте:")
-            print("   1. Правильное ли имя блока в вашем проекте?")
-            print("   2. Может быть используются другие имена (например, 'well', 'borehole', 'СКВ')?")
-            print("\n   Посмотрите на список 'ТИПЫ БЛОКОВ' выше и найдите правильное имя")
-        else:
-            print(f"✅ Найдено блоков 'скважина': {sum(skvazhina_blocks.values())} вставок")
-            print(f"   Варианты имен: {list(skvazhina_blocks.keys())}")
-
-            if sample_blocks and sample_blocks[0]['has_attributes']:
-                print(f"\n✅ Блоки имеют атрибуты:")
-                if sample_blocks[0]['attributes']:
-                    print(f"   Теги атрибутов: {list(sample_blocks[0]['attributes'].keys())}")
-                    print("   Используйте эти теги для извлечения номеров скважин")
+        # Общий с другими диагностическими скриптами проход по вставкам блоков,
+        # результат кэшируется до изменения чертежа
+        result = scan(doc, skip_without_definition=skvazhina_only)
+        if result.skipped:
+            print("⏭️ Определение блока 'скважина' не найдено - сканирование ModelSpace пропущено")
+
+        total_entities = doc.ModelSpace.Count
+        blocks_by_name = result.block_names
+
+        # Отчёт выводится одной записью в stdout
+        with buffered_output():
+            # Выводим результаты
+            print(f"\n📊 ОБЩАЯ СТАТИСТИКА:")
+            print(f"   Всего объектов: {total_entities}")
+            print(f"   Блоков (AcDbBlockReference): {result.total_block_refs}")
+            print(f"   Блоков с атрибутами: {result.blocks_with_attributes}")
+
+            print(f"\n📦 ТИПЫ БЛОКОВ (топ-20):")
+            sorted_blocks = sorted(blocks_by_name.items(), key=lambda x: x[1], reverse=True)
+            for name, count in sorted_blocks[:20]:
+                marker = "⭐" if is_borehole_name(name) else "  "
+                print(f"   {marker} '{name}': {count} вставок")
+
+            print(f"\n🗂️ БЛОКИ ПО СЛОЯМ (только слои с 'СКВ'):")
+            layer_counts = sorted(result.layer_block_counts.items())
+            for layer, layer_items in groupby(layer_counts, key=lambda x: x[0][0]):
+                if 'СКВ' in layer.upper():
+                    print(f"   Слой '{layer}':")
+                    for (_, block_name), count in layer_items:
+                        print(f"      - '{block_name}': {count} вставок")
+
+            print(f"\n🔍 ПРИМЕРЫ БЛОКОВ 'СКВАЖИНА':")
+            if result.samples:
+                for i, block in enumerate(result.samples, 1):
+                    print(f"\n   Пример #{i}:")
+                    print(f"      Имя: {block['effective_name'] or block['name']}")
+                    print(f"      Слой: {block['layer']}")
+                    print(f"      Позиция: ({block['position'][0]:.2f}, {block['position'][1]:.2f}, {block['position'][2]:.2f})")
+                    print(f"      Есть атрибуты: {block['has_attrs']}")
+                    if block['attrs']:
+                        print(f"      Атрибуты:")
+                        for tag, value in block['attrs'].items():
+                            print(f"         {tag}: {value}")
             else:
-                print(f"\n⚠️ Блоки НЕ имеют атрибутов")
-                print("   Возможно, номера хранятся в других объектах (текст рядом с блоком)")
+                print("   ⚠️ Не найдено блоков с именем 'скважина'")
+
+            print("\n" + "=" * 80)
+            print("РЕКОМЕНДАЦИИ:")
+            print("=" * 80)
+
+            # Анализ и рекомендации
+            skvazhina_blocks = {name: count for name, count in blocks_by_name.items()
+                               if is_borehole_name(name)}
+
+            if not skvazhina_blocks:
+                print("❌ Не найдено блоков с именем 'скважина'")
+                print("   Проверьте:")
+                print("   1. Правильное ли имя блока в вашем проекте?")
+                print("   2. Может быть используются другие имена (например, 'well', 'borehole', 'СКВ')?")
+                print("\n   Посмотрите на список 'ТИПЫ БЛОКОВ' выше и найдите правильное имя")
+            else:
+                print(f"✅ Найдено блоков 'скважина': {sum(skvazhina_blocks.values())} вставок")
+                print(f"   Варианты имен: {list(skvazhina_blocks.keys())}")
 
-        print("\n" + "=" * 80)
+                if result.samples and result.samples[0]['has_attrs']:
+                    print(f"\n✅ Блоки имеют атрибуты:")
+                    if result.samples[0]['attrs']:
+                        print(f"   Теги атрибутов: {list(result.samples[0]['attrs'].keys())}")
+                        print("   Используйте эти теги для извлечения номеров скважин")
+                else:
+                    print(f"\n⚠️ Блоки НЕ имеют атрибутов")
+                    print("   Возможно, номера хранятся в других объектах (текст рядом с блоком)")
+
+            print("\n" + "=" * 80)
 
     except Exception as e:
         print(f"❌ Ошибка: {e}")
@@ -201,5 +155,7 @@ def diagnose_autocad_blocks(dwg_path=None):
 
 
 if __name__ == "__main__":
-    dwg_path = sys.argv[1] if len(sys.argv) > 1 else None
-    diagnose_autocad_blocks(dwg_path)
+    skvazhina_only = '--skv-only' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--skv-only']
+    dwg_path = args[0] if args else None
+    diagnose_autocad_blocks(dwg_path, skvazhina_only=skvazhina_only)
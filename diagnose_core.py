@@ -0,0 +1,740 @@
+"""
+Общие функции для диагностических скриптов AutoCAD.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import pythoncom
+import win32com.client
+
+from src.autocad_com import (
+    BLOCK_REFERENCE_DISPIDS,
+    ENUM_BATCH_SIZE,
+    case_pattern,
+    get_property,
+    iter_batches,
+    read_attributes,
+    selected_entities,
+    wildcard_literal,
+)
+from src.autocad_connector import CACHE_DIR
+
+BLOCK_REFERENCE = 'AcDbBlockReference'
+BOREHOLE_BLOCK_NAME = 'скважина'
+
+MODEL_LAYOUT = 'Model'
+SELECTION_SET_NAME = 'diagnose_scan'
+# Отдельное имя для выборок из рабочего потока, чтобы не пересекаться
+# с одновременным сканированием ModelSpace
+WORKER_SELECTION_SET_NAME = 'diagnose_worker'
+
+# Объект приложения AutoCAD, полученный connect_autocad
+_application = None
+
+# Размер пачки для проходов с выводом прогресса: прогресс печатается
+# один раз на пачку
+PROGRESS_BATCH_SIZE = 10000
+
+# Каталог и префикс файлов кэша результатов сканирования. Каталог в профиле
+# пользователя, рядом с кэшем подключения, а не в общем %TEMP%. Версия
+# в префиксе меняется вместе с форматом записей
+BLOCK_CACHE_DIR = os.path.join(CACHE_DIR, 'blocks')
+BLOCK_CACHE_PREFIX = 'acad_blocks_v2_'
+
+# Сканирование скриптом AutoLISP включается переменной окружения
+# SKV_DIAG_LISP=1. Ошибки до запуска скрипта (SECURELOAD и доверенные пути,
+# open без "utf8" в старых версиях, занятая командная строка) не оставляют
+# файла .err и стоят LISP_START_TIMEOUT на каждом запуске, поэтому по
+# умолчанию используется обход через COM
+USE_LISP_SCAN = os.environ.get('SKV_DIAG_LISP') == '1'
+
+# Ожидание результата сканирования AutoLISP, сек: появления временного файла
+# (скрипт запущен) и готового файла (скрипт завершён)
+LISP_START_TIMEOUT = 15
+LISP_SCAN_TIMEOUT = 600
+
+# Обход вставок блоков внутри acad.exe. Для каждой вставки пишется строка
+# через табуляцию: Name, EffectiveName, Layer, X, Y, Z, HasAttributes,
+# IsDynamicBlock и пары тег/значение атрибутов. По завершении временный
+# файл переименовывается - это сигнал готовности для Python. При ошибке
+# локальный *error* закрывает и удаляет временный файл и пишет сообщение
+# в файл .err - Python не ждёт таймаута и сразу переходит на обход через COM.
+_LISP_SCAN_SOURCE = r"""
+(vl-load-com)
+
+(defun skv-diag-clean (s)
+  (vl-string-translate "\t\n\r" "   " (if s s ""))
+)
+
+(defun skv-diag-flag (v)
+  (if (= v :vlax-true) "1" "0")
+)
+
+(defun skv-diag (out-path / *error* tmp-path f pt line err)
+  (defun *error* (msg)
+    (if f (close f))
+    (if tmp-path (vl-file-delete tmp-path))
+    (if (setq err (open (strcat out-path ".err") "w" "utf8"))
+      (progn
+        (write-line (if msg msg "") err)
+        (close err)
+      )
+    )
+    (princ)
+  )
+  (setq tmp-path (strcat out-path ".tmp"))
+  (setq f (open tmp-path "w" "utf8"))
+  (vlax-for ent (vla-get-ModelSpace (vla-get-ActiveDocument (vlax-get-acad-object)))
+    (if (= (vla-get-ObjectName ent) "AcDbBlockReference")
+      (progn
+        (setq pt (vlax-get ent 'InsertionPoint))
+        (setq line
+          (strcat
+            (skv-diag-clean (vla-get-Name ent)) "\t"
+            (skv-diag-clean (vla-get-EffectiveName ent)) "\t"
+            (skv-diag-clean (vla-get-Layer ent)) "\t"
+            (rtos (car pt) 2 8) "\t"
+            (rtos (cadr pt) 2 8) "\t"
+            (rtos (caddr pt) 2 8) "\t"
+            (skv-diag-flag (vla-get-HasAttributes ent)) "\t"
+            (skv-diag-flag (vla-get-IsDynamicBlock ent))
+          )
+        )
+        (if (= (vla-get-HasAttributes ent) :vlax-true)
+          (foreach attr (vlax-invoke ent 'GetAttributes)
+            (setq line
+              (strcat line
+                "\t" (skv-diag-clean (vla-get-TagString attr))
+                "\t" (skv-diag-clean (vla-get-TextString attr))
+              )
+            )
+          )
+        )
+        (write-line line f)
+      )
+    )
+  )
+  (close f)
+  (vl-file-rename tmp-path out-path)
+  (princ)
+)
+"""
+
+
+def connect_autocad():
+    """
+    Подключение к AutoCAD с ранним связыванием.
+
+    gencache.EnsureDispatch генерирует (или берёт из кэша gen_py) обёртку
+    библиотеки типов AutoCAD, поэтому обращения к свойствам идут по известным
+    DISPID без GetIDsOfNames на каждый вызов. Если кэш недоступен или
+    повреждён, используется позднее связывание через dynamic.Dispatch.
+
+    Объект приложения кэшируется на время работы процесса: повторные вызовы
+    не ищут AutoCAD заново. Прокси привязан к апартаменту вызывающего потока,
+    в рабочие потоки объекты передаются через submit_com_task.
+
+    Returns:
+        Объект приложения AutoCAD
+    """
+    global _application
+    if _application is None:
+        try:
+            _application = win32com.client.gencache.EnsureDispatch("AutoCAD.Application")
+        except Exception:
+            _application = win32com.client.dynamic.Dispatch("AutoCAD.Application")
+    return _application
+
+
+def ensure_type_library(app):
+    """
+    Генерация модуля makepy для библиотеки типов AutoCAD.
+
+    Библиотека определяется по запущенному приложению, поэтому GUID и версию
+    для конкретной версии AutoCAD указывать не нужно. Сгенерированный модуль
+    сохраняется в кэше gen_py (win32com.__gen_path__, обычно
+    %TEMP%\\gen_py\\<версия Python>) и используется при следующих запусках.
+
+    Args:
+        app: Объект приложения AutoCAD (с ранним или поздним связыванием)
+
+    Returns:
+        Сгенерированный модуль обёрток
+    """
+    typelib, _ = app._oleobj_.GetTypeInfo().GetContainingTypeLib()
+    guid, lcid, _, major, minor, _ = typelib.GetLibAttr()
+    return win32com.client.gencache.EnsureModule(str(guid), lcid, major, minor)
+
+
+def cast_entity(entity, interface: str):
+    """
+    Приведение раннесвязанной обёртки объекта к нужному интерфейсу.
+
+    Коллекции с ранним связыванием возвращают объекты как IAcadEntity, у которого
+    нет свойств конкретного типа (Name, EffectiveName, TextString и т.д.).
+    Объекты с поздним связыванием возвращаются без изменений.
+
+    Args:
+        entity: Объект AutoCAD
+        interface: Имя интерфейса, например 'IAcadBlockReference'
+
+    Returns:
+        Объект, приведённый к интерфейсу
+    """
+    cls = type(entity)
+    if 'CLSID' in cls.__dict__ and cls.__name__ != interface:
+        return win32com.client.CastTo(entity, interface)
+    return entity
+
+
+def as_block_reference(entity):
+    """
+    Приведение объекта к интерфейсу вставки блока.
+
+    Args:
+        entity: Объект AutoCAD с EntityName == 'AcDbBlockReference'
+
+    Returns:
+        Объект с доступом к Name, EffectiveName, GetAttributes и т.д.
+    """
+    return cast_entity(entity, 'IAcadBlockReference')
+
+
+def iter_entities(collection, batch_size: int = ENUM_BATCH_SIZE):
+    """
+    Перебор объектов коллекции AutoCAD (запрашиваются пачками, см. iter_batches).
+
+    Объекты выдаются обёртками win32com с доступом к свойствам по имени.
+    Горячие проходы читают свойства через get_property у пачек iter_batches
+    без создания обёрток.
+
+    Args:
+        collection: Коллекция AutoCAD (ModelSpace, Block, SelectionSet)
+        batch_size: Размер пачки
+
+    Yields:
+        Объекты коллекции
+    """
+    wrap = win32com.client.Dispatch
+    for batch in iter_batches(collection, batch_size):
+        for item in batch:
+            yield wrap(item)
+
+
+def is_borehole_name(name) -> bool:
+    """
+    Проверка, содержит ли имя блока "скважина" без учёта регистра.
+
+    Имена блоков обычно уже в нижнем регистре, поэтому сначала проверяется
+    исходная строка - .lower() с созданием новой строки нужен только
+    при промахе.
+
+    Args:
+        name: Имя блока (может быть None или пустым)
+
+    Returns:
+        bool: True если имя относится к блоку скважины
+    """
+    return bool(name) and (BOREHOLE_BLOCK_NAME in name or BOREHOLE_BLOCK_NAME in name.lower())
+
+
+@contextmanager
+def buffered_output():
+    """
+    Буферизация вывода print() с одной записью в stdout при выходе.
+
+    Отчёт из десятков и сотен строк выводится одним вызовом write вместо
+    отдельной записи и сброса буфера на каждую строку. Накопленный текст
+    выводится и при исключении.
+    """
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            yield
+    finally:
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+
+
+def select_block_references(doc, name_substring=None, layout: str = MODEL_LAYOUT,
+                            selection_name: str = SELECTION_SET_NAME):
+    """
+    Выборка вставок блоков на листе, опционально по подстроке имени.
+
+    Анонимные вставки динамических блоков (*U123) попадают в выборку всегда,
+    так как их настоящее имя доступно только через EffectiveName -
+    вызывающий код должен дофильтровать их сам.
+
+    Args:
+        doc: Документ AutoCAD
+        name_substring: Подстрока имени блока или None для всех блоков
+        layout: Имя листа (по умолчанию пространство модели)
+        selection_name: Имя набора выбора
+
+    Returns:
+        Контекстный менеджер с набором выбора
+    """
+    # Имя листа задаётся точно: символы шаблонов в нём экранируются
+    filter_codes = [0, 410]
+    filter_values = ['INSERT', wildcard_literal(layout)]
+    if name_substring:
+        filter_codes.append(2)
+        filter_values.append(case_pattern(name_substring, '*', '*') + ',`*U*')
+    return selected_entities(doc, filter_codes, filter_values, selection_name)
+
+
+def _call_with_marshaled(func, stream, args):
+    """
+    Вызов функции в рабочем потоке с объектом COM из другого апартамента.
+
+    Args:
+        func: Функция, первым аргументом принимающая объект COM
+        stream: Поток с маршалированным интерфейсом IDispatch
+        args: Остальные аргументы функции
+
+    Returns:
+        Результат func
+    """
+    pythoncom.CoInitialize()
+    try:
+        dispatch = pythoncom.CoGetInterfaceAndReleaseStream(stream, pythoncom.IID_IDispatch)
+        com_object = win32com.client.Dispatch(dispatch)
+        try:
+            return func(com_object, *args)
+        finally:
+            # Прокси должен быть освобождён до CoUninitialize
+            del com_object, dispatch
+    finally:
+        pythoncom.CoUninitialize()
+
+
+def submit_com_task(executor, func, com_object, *args):
+    """
+    Запуск функции над объектом COM в пуле потоков.
+
+    Объекты AutoCAD живут в однопоточном апартаменте (STA) и не могут
+    напрямую передаваться между потоками, поэтому интерфейс маршалируется
+    через CoMarshalInterThreadInterfaceInStream, а рабочий поток получает
+    собственный прокси. AutoCAD всё равно обрабатывает вызовы по одному,
+    так что выигрыш даёт только перекрытие с работой вызывающего потока.
+
+    Args:
+        executor: ThreadPoolExecutor
+        func: Функция, первым аргументом принимающая объект COM
+        com_object: Объект COM (например, документ AutoCAD)
+        *args: Остальные аргументы функции
+
+    Returns:
+        Future с результатом func
+    """
+    stream = pythoncom.CoMarshalInterThreadInterfaceInStream(
+        pythoncom.IID_IDispatch, com_object._oleobj_)
+    return executor.submit(_call_with_marshaled, func, stream, args)
+
+
+def find_borehole_definitions(doc) -> List[Dict[str, Any]]:
+    """
+    Поиск определений блоков "скважина" в таблице блоков документа.
+
+    Таблица блоков обычно на порядки меньше пространства модели, поэтому по
+    ней можно быстро понять, есть ли смысл искать вставки.
+
+    Args:
+        doc: Документ AutoCAD
+
+    Returns:
+        List[Dict[str, Any]]: Подходящие определения блоков
+    """
+    definitions = []
+    for block_def in iter_entities(doc.Blocks):
+        name = block_def.Name
+        if is_borehole_name(name):
+            definitions.append({
+                'name': name,
+                'is_xref': getattr(block_def, 'IsXRef', False),
+                'is_layout': getattr(block_def, 'IsLayout', False),
+                'count': block_def.Count
+            })
+    return definitions
+
+
+def _scan_block_refs_com(doc) -> List[Dict[str, Any]]:
+    """
+    Один проход по вставкам блоков пространства модели через COM.
+
+    Для всех вставок сохраняются имена, слой и признак атрибутов; позиция
+    и атрибуты читаются лишь у блоков "скважина".
+
+    Args:
+        doc: Документ AutoCAD
+
+    Returns:
+        List[Dict[str, Any]]: Записи о вставках блоков
+    """
+    records = []
+    # Локальные ссылки вместо поиска глобальных имён и атрибутов на каждой итерации
+    append_record = records.append
+    get = get_property
+    dispids = BLOCK_REFERENCE_DISPIDS
+    is_match = is_borehole_name
+
+    with select_block_references(doc) as selection:
+        # В выборке только вставки блоков: свойства читаются по DISPID
+        # у PyIDispatch, без обёртки и приведения к IAcadBlockReference
+        for batch in iter_batches(selection):
+            for entity in batch:
+                # Name и EffectiveName обязательны у вставки блока. У статических
+                # блоков они совпадают, у динамических значимо EffectiveName -
+                # поэтому достаточно одной проверки
+                name = get(entity, 'Name', dispids)
+                effective_name = get(entity, 'EffectiveName', dispids)
+                is_borehole = is_match(effective_name or name)
+
+                has_attrs = get(entity, 'HasAttributes', dispids)
+
+                record = {
+                    'name': name,
+                    'effective_name': effective_name,
+                    'layer': get(entity, 'Layer', dispids),
+                    'has_attrs': has_attrs,
+                    'is_borehole': is_borehole
+                }
+
+                if is_borehole:
+                    # Точка вставки читается один раз и сразу распаковывается
+                    x, y, z = get(entity, 'InsertionPoint', dispids)
+                    record.update({
+                        'position': (x, y, z),
+                        'is_dynamic': get(entity, 'IsDynamicBlock', dispids),
+                        'attrs': read_attributes(entity) if has_attrs else {}
+                    })
+
+                append_record(record)
+                if len(records) % 10000 == 0:
+                    print(f"Обработано {len(records)} вставок блоков...")
+
+    return records
+
+
+def _scan_block_refs_lisp(doc) -> List[Dict[str, Any]]:
+    """
+    Обход вставок блоков скриптом AutoLISP внутри acad.exe.
+
+    Через COM передаётся только SendCommand, сам обход ModelSpace выполняется
+    в процессе AutoCAD и пишет результат во временный файл, который затем
+    разбирается в Python. Формат записей совпадает с _scan_block_refs_com.
+
+    Args:
+        doc: Активный документ AutoCAD
+
+    Returns:
+        List[Dict[str, Any]]: Записи о вставках блоков
+
+    Raises:
+        RuntimeError: Документ не активен (скрипт работает с ActiveDocument)
+            или скрипт завершился ошибкой
+        TimeoutError: Скрипт не запустился или не завершился вовремя
+    """
+    if not doc.Active:
+        raise RuntimeError("документ не активен")
+
+    temp_dir = tempfile.gettempdir()
+    lisp_path = os.path.join(temp_dir, f'skv_diag_{os.getpid()}.lsp')
+    out_path = os.path.join(temp_dir, f'skv_diag_{os.getpid()}.txt')
+    tmp_path = out_path + '.tmp'
+    err_path = out_path + '.err'
+
+    with open(lisp_path, 'w', encoding='utf-8') as f:
+        f.write(_LISP_SCAN_SOURCE)
+    for path in (out_path, tmp_path, err_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    # AutoLISP принимает пути с прямыми слешами
+    lisp_file = lisp_path.replace('\\', '/')
+    out_file = out_path.replace('\\', '/')
+    print("🔍 Сканирование вставок блоков скриптом AutoLISP...")
+    doc.SendCommand(f'(load "{lisp_file}")\n(skv-diag "{out_file}")\n')
+
+    start_time = time.monotonic()
+    while not os.path.exists(out_path):
+        # Обработчик *error* скрипта оставляет файл с сообщением об ошибке
+        if os.path.exists(err_path):
+            with open(err_path, encoding='utf-8', errors='replace') as f:
+                message = f.read().strip()
+            os.remove(err_path)
+            raise RuntimeError(f"ошибка скрипта AutoLISP: {message}")
+        elapsed = time.monotonic() - start_time
+        if elapsed > LISP_SCAN_TIMEOUT:
+            raise TimeoutError(f"скрипт не завершился за {LISP_SCAN_TIMEOUT} сек")
+        if elapsed > LISP_START_TIMEOUT and not os.path.exists(tmp_path):
+            raise TimeoutError(f"скрипт не запустился за {LISP_START_TIMEOUT} сек")
+        time.sleep(0.2)
+
+    records = []
+    with open(out_path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            name, effective_name, layer, x, y, z, has_attrs, is_dynamic = fields[:8]
+            is_borehole = is_borehole_name(effective_name or name)
+
+            record = {
+                'name': name,
+                'effective_name': effective_name,
+                'layer': layer,
+                'has_attrs': has_attrs == '1',
+                'is_borehole': is_borehole
+            }
+            if is_borehole:
+                record.update({
+                    'position': (float(x), float(y), float(z)),
+                    'is_dynamic': is_dynamic == '1',
+                    'attrs': dict(zip(fields[8::2], fields[9::2]))
+                })
+            records.append(record)
+
+    os.remove(out_path)
+    return records
+
+
+def _scan_block_refs(doc) -> List[Dict[str, Any]]:
+    """
+    Сканирование вставок блоков через COM или, если включено USE_LISP_SCAN,
+    скриптом AutoLISP внутри acad.exe с переходом на COM при ошибке.
+
+    Args:
+        doc: Документ AutoCAD
+
+    Returns:
+        List[Dict[str, Any]]: Записи о вставках блоков (см. _scan_block_refs_com)
+    """
+    if not USE_LISP_SCAN:
+        return _scan_block_refs_com(doc)
+
+    try:
+        return _scan_block_refs_lisp(doc)
+    except Exception as e:
+        print(f"⚠️ Сканирование AutoLISP недоступно ({e}), используется обход через COM")
+        return _scan_block_refs_com(doc)
+
+
+def _block_cache_key(doc):
+    """
+    Ключ кэша сканирования: хеш полного пути и время изменения файла.
+
+    Args:
+        doc: Документ AutoCAD
+
+    Returns:
+        Tuple[str, int] или None, если документ не сохранён на диск или
+        содержит несохранённые изменения - время изменения файла их не отражает
+    """
+    full_name = doc.FullName
+    if not full_name or not os.path.exists(full_name) or not doc.Saved:
+        return None
+    digest = hashlib.md5(full_name.lower().encode('utf-8')).hexdigest()
+    return digest, int(os.path.getmtime(full_name))
+
+
+def collect_block_refs(doc) -> List[Dict[str, Any]]:
+    """
+    Вставки блоков пространства модели с кэшированием между запусками.
+
+    Результат сканирования сохраняется в JSON в каталоге BLOCK_CACHE_DIR, имя
+    файла содержит хеш пути к чертежу и время его изменения. Повторный запуск
+    любого диагностического скрипта для неизменённого чертежа читает кэш вместо
+    обхода ModelSpace; после сохранения чертежа кэш пересоздаётся. Чертёж с
+    несохранёнными изменениями сканируется без кэша.
+
+    Args:
+        doc: Документ AutoCAD
+
+    Returns:
+        List[Dict[str, Any]]: Записи о вставках блоков (см. _scan_block_refs_com)
+    """
+    key = _block_cache_key(doc)
+    if key is None:
+        return _scan_block_refs(doc)
+
+    digest, mtime = key
+    cache_dir = BLOCK_CACHE_DIR
+    cache_path = os.path.join(cache_dir, f"{BLOCK_CACHE_PREFIX}{digest}_{mtime}.json")
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                records = json.load(f)
+            # JSON хранит кортеж позиции как список
+            for record in records:
+                if 'position' in record:
+                    record['position'] = tuple(record['position'])
+            print(f"📦 Использован кэш сканирования: {cache_path}")
+            return records
+        except (OSError, ValueError, TypeError) as e:
+            print(f"⚠️ Не удалось прочитать кэш {cache_path}: {e}")
+
+    records = _scan_block_refs(doc)
+
+    # Удаляем кэш предыдущих версий чертежа
+    for stale_path in glob.glob(os.path.join(cache_dir, f"{BLOCK_CACHE_PREFIX}{digest}_*.json")):
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"⚠️ Не удалось сохранить кэш {cache_path}: {e}")
+
+    return records
+
+
+def count_paperspace_refs(doc, selection_name: str = SELECTION_SET_NAME) -> List[Tuple[str, int]]:
+    """
+    Подсчёт вставок блока "скважина" на листах PaperSpace.
+
+    Args:
+        doc: Документ AutoCAD
+        selection_name: Имя набора выбора
+
+    Returns:
+        List[Tuple[str, int]]: Пары (имя листа, число вставок) для листов со вставками
+    """
+    counts = []
+    layouts = doc.Layouts
+    for i in range(layouts.Count):
+        layout = layouts.Item(i)
+        if layout.ModelType:
+            continue
+
+        layout_name = layout.Name
+        ps_count = 0
+
+        # Фильтр по листу, типу и имени выполняет AutoCAD: через COM
+        # идут только вставки "скважина" и анонимные динамические блоки
+        with select_block_references(doc, BOREHOLE_BLOCK_NAME, layout=layout_name,
+                                     selection_name=selection_name) as selection:
+            # Локальные ссылки для горячего цикла
+            get = get_property
+            dispids = BLOCK_REFERENCE_DISPIDS
+            is_match = is_borehole_name
+
+            for batch in iter_batches(selection):
+                for entity in batch:
+                    # EffectiveName есть у любой вставки; Name нужен,
+                    # только если оно пустое
+                    name = get(entity, 'EffectiveName', dispids) or get(entity, 'Name', dispids)
+                    if is_match(name):
+                        ps_count += 1
+
+        if ps_count > 0:
+            counts.append((layout_name, ps_count))
+
+    return counts
+
+
+@dataclass(slots=True)
+class ScanResult:
+    """Результат сканирования вставок блоков документа."""
+    total_block_refs: int = 0
+    block_names: Counter = field(default_factory=Counter)
+    # Число вставок по паре (слой, имя блока) и вставок с атрибутами - по всем блокам
+    layer_block_counts: Counter = field(default_factory=Counter)
+    blocks_with_attributes: int = 0
+    matches: List[Dict[str, Any]] = field(default_factory=list)
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+    definitions: Optional[List[Dict[str, Any]]] = None
+    paperspace_counts: Optional[List[Tuple[str, int]]] = None
+    skipped: bool = False
+
+
+def scan(doc, collect_samples: int = 5, include_paperspace: bool = False,
+         include_blocks_collection: bool = False,
+         skip_without_definition: bool = False) -> ScanResult:
+    """
+    Сканирование вставок блоков для всех диагностических скриптов.
+
+    Args:
+        doc: Документ AutoCAD
+        collect_samples: Сколько вставок "скважина" сохранить как примеры
+        include_paperspace: Подсчитать вставки "скважина" на листах PaperSpace
+            (в рабочем потоке, одновременно с обходом ModelSpace)
+        include_blocks_collection: Найти определения "скважина" в таблице блоков
+        skip_without_definition: Не сканировать ModelSpace, если определений
+            "скважина" нет (включает поиск определений)
+
+    Returns:
+        ScanResult: Статистика по именам блоков и слоям, вставки "скважина" и,
+        по запросу, определения блоков и вставки на листах
+    """
+    result = ScanResult()
+
+    if include_blocks_collection or skip_without_definition:
+        result.definitions = find_borehole_definitions(doc)
+        if skip_without_definition and not result.definitions:
+            result.skipped = True
+            return result
+
+    paperspace_future = None
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        if include_paperspace:
+            try:
+                paperspace_future = submit_com_task(
+                    executor, count_paperspace_refs, doc, WORKER_SELECTION_SET_NAME)
+            except Exception as e:
+                print(f"⚠️ Не удалось передать документ в рабочий поток: {e}")
+
+        records = collect_block_refs(doc)
+
+    block_names = result.block_names
+    layer_block_counts = result.layer_block_counts
+    matches = result.matches
+    for record in records:
+        name = record['effective_name'] or record['name'] or 'Unknown'
+        block_names[name] += 1
+        layer_block_counts[record['layer'], name] += 1
+        if record['has_attrs']:
+            result.blocks_with_attributes += 1
+        if record['is_borehole']:
+            matches.append(record)
+
+    result.total_block_refs = len(records)
+    result.samples = matches[:collect_samples]
+
+    if include_paperspace:
+        if paperspace_future is not None:
+            try:
+                result.paperspace_counts = paperspace_future.result()
+            except Exception as e:
+                print(f"⚠️ Проверка PaperSpace в рабочем потоке не удалась ({e}), повтор последовательно")
+
+        if result.paperspace_counts is None:
+            try:
+                result.paperspace_counts = count_paperspace_refs(doc)
+            except Exception as e:
+                print(f"⚠️ Ошибка проверки PaperSpace: {e}")
+
+    return result
+
+
+if __name__ == "__main__":
+    # Предварительная генерация обёрток, чтобы первый запуск диагностики
+    # не тратил время на makepy
+    module = ensure_type_library(win32com.client.dynamic.Dispatch("AutoCAD.Application"))
+    print(f"✅ Обёртки библиотеки типов AutoCAD: {module.__file__}")
+    print(f"   Кэш gen_py: {win32com.__gen_path__}")
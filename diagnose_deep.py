@@ -2,20 +2,28 @@
 Глубокая диагностика AutoCAD - проверяет все возможные места, где могут быть блоки.
 """
 
-import win32com.client
 import sys
 import os
+from collections import Counter
 
-def deep_diagnose():
-    """Детальная диагностика AutoCAD."""
+from diagnose_core import connect_autocad, is_borehole_name, scan
+
+def deep_diagnose(skvazhina_only=False):
+    """
+    Детальная диагностика AutoCAD.
+
+    Args:
+        skvazhina_only: Нужна только диагностика блоков "скважина" - при
+            отсутствии их определений ModelSpace не сканируется
+    """
     print("=" * 80)
     print("ГЛУБОКАЯ ДИАГНОСТИКА AUTOCAD")
     print("=" * 80)
 
-    # Используем dynamic.Dispatch для избежания проблем с кэшем
+    # Раннее связывание через gencache, при проблемах с кэшем - dynamic.Dispatch
     try:
-        acad = win32com.client.dynamic.Dispatch("AutoCAD.Application")
-        print(f"✅ Подключено к AutoCAD (dynamic) версии: {acad.Version}")
+        acad = connect_autocad()
+        print(f"✅ Подключено к AutoCAD версии: {acad.Version}")
     except Exception as e:
         print(f"❌ Ошибка подключения: {e}")
         print("\n💡 РЕШЕНИЕ:")
@@ -76,64 +84,34 @@ def deep_diagnose():
     print("ШАГ 3: ПОИСК БЛОКОВ В MODELSPACE")
     print("=" * 80)
 
+    # Рекомендации ниже выводятся и при ошибке сканирования
+    block_names = Counter()
     try:
         model_space = doc.ModelSpace
         print(f"ModelSpace: {model_space.Count} объектов")
 
-        block_refs = []
-        block_names = {}
-
-        for entity in model_space:
-            if entity.EntityName == 'AcDbBlockReference':
-                block_refs.append(entity)
-                name = getattr(entity, 'EffectiveName', getattr(entity, 'Name', 'Unknown'))
+        # Таблица блоков на порядки меньше ModelSpace: без определения
+        # "скважина" полный проход нужен только ради общей статистики.
+        # Проход общий с другими диагностическими скриптами и кэшируется
+        result = scan(doc, skip_without_definition=skvazhina_only)
+        if result.skipped:
+            print("⏭️ Определение блока 'скважина' не найдено - сканирование ModelSpace пропущено")
 
-                if name not in block_names:
-                    block_names[name] = 0
-                block_names[name] += 1
+        block_names = result.block_names
 
-        print(f"\n📦 Найдено {len(block_refs)} вставок блоков")
+        print(f"\n📦 Найдено {result.total_block_refs} вставок блоков")
 
         if block_names:
             print(f"\nТипы блоков:")
             for name, count in sorted(block_names.items(), key=lambda x: x[1], reverse=True)[:20]:
-                marker = "⭐" if 'скважина' in name.lower() else "  "
+                marker = "⭐" if is_borehole_name(name) else "  "
                 print(f"   {marker} '{name}': {count} вставок")
 
-        # Показываем примеры блоков "скважина"
-        skvazhina_examples = []
-        for entity in model_space:
-            if entity.EntityName == 'AcDbBlockReference':
-                name = getattr(entity, 'EffectiveName', getattr(entity, 'Name', 'Unknown'))
-                if 'скважина' in name.lower():
-                    layer = getattr(entity, 'Layer', 'Unknown')
-                    has_attrs = getattr(entity, 'HasAttributes', False)
-                    pos = entity.InsertionPoint
-
-                    attrs = {}
-                    if has_attrs:
-                        try:
-                            for attr in entity.GetAttributes():
-                                attrs[attr.TagString] = attr.TextString
-                        except:
-                            pass
-
-                    skvazhina_examples.append({
-                        'name': name,
-                        'layer': layer,
-                        'position': (pos[0], pos[1], pos[2]),
-                        'has_attrs': has_attrs,
-                        'attrs': attrs
-                    })
-
-                    if len(skvazhina_examples) >= 5:
-                        break
-
-        if skvazhina_examples:
+        if result.samples:
             print(f"\n🔍 ПРИМЕРЫ БЛОКОВ 'СКВАЖИНА':")
-            for i, ex in enumerate(skvazhina_examples, 1):
+            for i, ex in enumerate(result.samples, 1):
                 print(f"\n   Пример #{i}:")
-                print(f"      Имя: {ex['name']}")
+                print(f"      Имя: {ex['effective_name'] or ex['name']}")
                 print(f"      Слой: {ex['layer']}")
                 print(f"      Позиция: ({ex['position'][0]:.2f}, {ex['position'][1]:.2f}, {ex['position'][2]:.2f})")
                 print(f"      Есть атрибуты: {ex['has_attrs']}")
@@ -193,8 +171,8 @@ def deep_diagnose():
         print("   >>> if os.path.exists(gen_py): shutil.rmtree(gen_py)")
         print("\n5. Переключитесь в AutoCAD на вкладку 'Model' (не Layout)")
     else:
-        if any('скважина' in name.lower() for name in block_names.keys()):
-            print(f"✅ Найдены блоки 'скважина': {sum(c for n, c in block_names.items() if 'скважина' in n.lower())} вставок")
+        if any(is_borehole_name(name) for name in block_names.keys()):
+            print(f"✅ Найдены блоки 'скважина': {sum(c for n, c in block_names.items() if is_borehole_name(n))} вставок")
         else:
             print("⚠️ Блоки 'скважина' не найдены")
             print(f"   Проверьте список выше - возможно, блоки называются иначе")
@@ -203,4 +181,4 @@ def deep_diagnose():
 
 
 if __name__ == "__main__":
-    deep_diagnose()
+    deep_diagnose(skvazhina_only='--skv-only' in sys.argv)
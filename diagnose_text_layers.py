@@ -2,8 +2,120 @@
 Поиск текстовых объектов на слоях со "СКВ" и рядом с блоками.
 """
 
-import win32com.client
 import re
+from collections import Counter
+
+import pywintypes
+import win32com.client
+
+from diagnose_core import (
+    BLOCK_REFERENCE,
+    MODEL_LAYOUT,
+    PROGRESS_BATCH_SIZE,
+    SELECTION_SET_NAME,
+    as_block_reference,
+    cast_entity,
+    connect_autocad,
+)
+from src.autocad_com import (
+    ENTITY_DISPIDS,
+    get_property,
+    iter_batches,
+    read_attributes,
+    selected_entities,
+    wildcard_literal,
+)
+
+# Интерфейсы объектов с TextString. Коллекции с ранним связыванием
+# возвращают IAcadEntity, поэтому текст приводится к своему интерфейсу
+TEXT_INTERFACES = {
+    'AcDbText': 'IAcadText',
+    'AcDbMText': 'IAcadMText',
+    'AcDbAttributeDefinition': 'IAcadAttribute',
+}
+
+# Типы DXF для фильтра выборки: тексты из TEXT_INTERFACES и вставки блоков
+SELECTED_DXF_TYPES = 'TEXT,MTEXT,ATTDEF,INSERT'
+
+# Варианты записи номера скважины в порядке приоритета: номер берётся из
+# первого совпавшего варианта, даже если другой вариант встречается в тексте
+# раньше ("№5 скв12" -> 12). Выражения компилируются один раз
+BOREHOLE_NUMBER_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE).search
+    for pattern in (
+        r'скв[а-я]*\.?\s*(\d+)',
+        r'№\s*(\d+)',
+        r'(\d+)\s*скв',
+        r'скв\s*(\d+)',
+        r'^(\d+)$',
+    )
+)
+
+# Сколько текстов сохраняется для поиска номеров и сколько блоков с
+# атрибутами - для примеров. Остальные объекты только подсчитываются
+TEXT_SAMPLE_LIMIT = 100
+ATTRIBUTED_SAMPLE_LIMIT = 5
+
+# Любой вариант BOREHOLE_NUMBER_PATTERNS требует цифру: тексты без цифр
+# отсекаются дешёвой проверкой до основного поиска
+HAS_DIGIT = re.compile(r'\d').search
+
+def _collect_text(entity, entity_type, layer, texts):
+    """
+    Учёт текстового объекта: подсчёт и, пока не набран образец, запись в столбцы.
+
+    Args:
+        entity: Текстовый объект AutoCAD
+        entity_type: EntityName объекта (ключ TEXT_INTERFACES)
+        layer: Слой объекта
+        texts: Таблица текстов: счётчик 'count' и столбцы 'text', 'layer',
+            'position', 'type'
+    """
+    texts['count'] += 1
+    if len(texts['text']) >= TEXT_SAMPLE_LIMIT:
+        return
+
+    entity = cast_entity(entity, TEXT_INTERFACES[entity_type])
+    # Все свойства читаются до записи, чтобы ошибка COM не оставила
+    # столбцы разной длины. Точка вставки распаковывается сразу
+    x, y, z = entity.InsertionPoint
+    text = entity.TextString
+    texts['text'].append(text)
+    texts['layer'].append(layer)
+    texts['position'].append((x, y, z))
+    texts['type'].append(entity_type)
+
+
+def _collect_block(entity, entity_type, layer, blocks):
+    """
+    Учёт вставки блока: подсчёт по имени и запись примеров блоков с атрибутами.
+
+    Args:
+        entity: Вставка блока
+        entity_type: EntityName объекта
+        layer: Слой объекта
+        blocks: Таблица блоков: Counter 'counts' по именам и столбцы примеров
+            'name', 'layer', 'position', 'attrs'
+    """
+    entity = as_block_reference(entity)
+    name = entity.EffectiveName or entity.Name or 'Unknown'
+    blocks['counts'][name] += 1
+
+    if len(blocks['name']) >= ATTRIBUTED_SAMPLE_LIMIT or not entity.HasAttributes:
+        return
+
+    attrs = read_attributes(entity)
+    if not attrs:
+        return
+
+    # Все свойства читаются до записи, чтобы ошибка COM не оставила
+    # столбцы разной длины
+    x, y, z = entity.InsertionPoint
+    blocks['name'].append(name)
+    blocks['layer'].append(layer)
+    blocks['position'].append((x, y, z))
+    blocks['attrs'].append(attrs)
+
 
 def diagnose_text_and_layers():
     """Анализ текстов на слоях со СКВ."""
@@ -11,7 +123,8 @@ def diagnose_text_and_layers():
     print("АНАЛИЗ ТЕКСТОВЫХ ОБЪЕКТОВ И СЛОЕВ СО 'СКВ'")
     print("=" * 80)
 
-    acad = win32com.client.dynamic.Dispatch("AutoCAD.Application")
+    # Раннее связывание через gencache, при проблемах с кэшем - dynamic.Dispatch
+    acad = connect_autocad()
     doc = acad.ActiveDocument
 
     print(f"Документ: {doc.Name}\n")
@@ -35,95 +148,87 @@ def diagnose_text_and_layers():
     print("ШАГ 2: ПОИСК ТЕКСТОВ НА СЛОЯХ СО 'СКВ'")
     print("-" * 80)
 
-    text_objects = []
-    blocks_on_skv_layers = []
+    # Образцы для отчёта хранятся по столбцам, остальные объекты сразу
+    # сворачиваются в счётчики - память не растёт с размером чертежа
+    texts = {'count': 0, 'text': [], 'layer': [], 'position': [], 'type': []}
+    blocks = {'counts': Counter(), 'name': [], 'layer': [], 'position': [], 'attrs': []}
 
-    model_space = doc.ModelSpace
     processed = 0
+    # Ошибки чтения объектов по типу исключения - выводятся после прохода
+    error_counts = Counter()
+
+    # Обработчик и таблица результатов по типу объекта: для каждого типа
+    # читаются только его свойства, прочие объекты пропускаются сразу
+    handlers = {entity_type: (_collect_text, texts) for entity_type in TEXT_INTERFACES}
+    handlers[BLOCK_REFERENCE] = (_collect_block, blocks)
+
+    # Отбор по типу, пространству модели и слоям со СКВ выполняет AutoCAD:
+    # через COM передаются только подходящие объекты. Имена слоёв из шага 1
+    # задаются точно, без шаблона по подстроке
+    if skv_layers:
+        layers_filter = ','.join(wildcard_literal(name) for name in skv_layers)
+        with selected_entities(doc, [0, 410, 8], [SELECTED_DXF_TYPES, MODEL_LAYOUT, layers_filter],
+                                SELECTION_SET_NAME) as selection:
+            # Локальные ссылки для горячего цикла
+            get_handler = handlers.get
+            get = get_property
+            wrap = win32com.client.Dispatch
+            com_errors = (pywintypes.com_error, AttributeError)
+
+            # Прогресс выводится раз на пачку, а не проверяется на каждом объекте
+            for batch in iter_batches(selection, PROGRESS_BATCH_SIZE):
+                for entity in batch:
+                    try:
+                        # EntityName и Layer общие для всех объектов - читаются
+                        # по DISPID; обёртка с приведением к интерфейсу типа
+                        # создаётся только для обрабатываемых объектов
+                        entity_type = get(entity, 'EntityName', ENTITY_DISPIDS)
+                        handler = get_handler(entity_type)
+                        if handler is None:
+                            continue
 
-    for entity in model_space:
-        processed += 1
-        if processed % 10000 == 0:
-            print(f"Обработано {processed} объектов...")
+                        collect, columns = handler
+                        collect(wrap(entity), entity_type, get(entity, 'Layer', ENTITY_DISPIDS), columns)
 
-        try:
-            entity_layer = getattr(entity, 'Layer', None)
-            if not entity_layer:
-                continue
+                    except com_errors as e:
+                        error_counts[type(e).__name__] += 1
+                        continue
 
-            # Только объекты на слоях со СКВ
-            if not any(skv in entity_layer.upper() for skv in ['СКВ']):
-                continue
+                processed += len(batch)
+                print(f"Обработано {processed} объектов...")
 
-            entity_type = entity.EntityName
+    if error_counts:
+        errors = ', '.join(f"{name}: {count}" for name, count in error_counts.most_common())
+        print(f"⚠️ Пропущено объектов из-за ошибок чтения: {sum(error_counts.values())} ({errors})")
 
-            # Текстовые объекты
-            if hasattr(entity, 'TextString'):
-                text = entity.TextString
-                pos = entity.InsertionPoint
+    blocks_by_name = blocks['counts']
+    blocks_count = sum(blocks_by_name.values())
 
-                text_objects.append({
-                    'text': text,
-                    'layer': entity_layer,
-                    'position': (pos[0], pos[1], pos[2]),
-                    'type': entity_type
-                })
-
-            # Блоки
-            elif entity_type == 'AcDbBlockReference':
-                name = getattr(entity, 'EffectiveName', getattr(entity, 'Name', 'Unknown'))
-                pos = entity.InsertionPoint
-                has_attrs = getattr(entity, 'HasAttributes', False)
-
-                attrs = {}
-                if has_attrs:
-                    try:
-                        for attr in entity.GetAttributes():
-                            attrs[attr.TagString] = attr.TextString
-                    except:
-                        pass
-
-                blocks_on_skv_layers.append({
-                    'name': name,
-                    'layer': entity_layer,
-                    'position': (pos[0], pos[1], pos[2]),
-                    'has_attrs': has_attrs,
-                    'attrs': attrs
-                })
-
-        except:
-            continue
-
-    print(f"\n✅ Найдено {len(text_objects)} текстовых объектов")
-    print(f"✅ Найдено {len(blocks_on_skv_layers)} блоков")
+    print(f"\n✅ Найдено {texts['count']} текстовых объектов")
+    print(f"✅ Найдено {blocks_count} блоков")
 
     # Анализируем текстовые объекты
     print("\n" + "=" * 80)
     print("ШАГ 3: АНАЛИЗ ТЕКСТОВ (ПОИСК НОМЕРОВ СКВАЖИН)")
     print("=" * 80)
 
-    patterns = [
-        r'скв[а-я]*\.?\s*(\d+)',
-        r'№\s*(\d+)',
-        r'(\d+)\s*скв',
-        r'скв\s*(\d+)',
-        r'^(\d+)$',
-    ]
-
     potential_boreholes = []
+    searches = BOREHOLE_NUMBER_PATTERNS
 
-    for text_obj in text_objects[:100]:  # Первые 100 для примера
-        text = text_obj['text'].strip().lower()
+    # Сохранены только первые TEXT_SAMPLE_LIMIT текстов
+    for text, layer, position in zip(texts['text'], texts['layer'], texts['position']):
+        if not HAS_DIGIT(text):
+            continue
 
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        stripped = text.strip()
+        for search in searches:
+            match = search(stripped)
             if match:
-                number = match.group(1)
                 potential_boreholes.append({
-                    'number': number,
-                    'text': text_obj['text'],
-                    'layer': text_obj['layer'],
-                    'position': text_obj['position']
+                    'number': match.group(1),
+                    'text': text,
+                    'layer': layer,
+                    'position': position
                 })
                 break
 
@@ -142,28 +247,20 @@ def diagnose_text_and_layers():
     print("ШАГ 4: АНАЛИЗ БЛОКОВ НА СЛОЯХ СКВ")
     print("=" * 80)
 
-    blocks_by_name = {}
-    for block in blocks_on_skv_layers:
-        name = block['name']
-        if name not in blocks_by_name:
-            blocks_by_name[name] = 0
-        blocks_by_name[name] += 1
-
     print(f"Типы блоков (топ-20):")
-    for name, count in sorted(blocks_by_name.items(), key=lambda x: x[1], reverse=True)[:20]:
+    for name, count in blocks_by_name.most_common(20):
         print(f"   '{name}': {count} вставок")
 
     # Показываем примеры блоков с атрибутами
-    blocks_with_attrs = [b for b in blocks_on_skv_layers if b['has_attrs'] and b['attrs']]
-
-    if blocks_with_attrs:
-        print(f"\n📌 Блоки с атрибутами (первые 5):")
-        for i, block in enumerate(blocks_with_attrs[:5], 1):
-            print(f"\n   #{i}: Блок '{block['name']}'")
-            print(f"        Слой: {block['layer']}")
-            print(f"        Позиция: ({block['position'][0]:.2f}, {block['position'][1]:.2f}, {block['position'][2]:.2f})")
+    if blocks['name']:
+        print(f"\n📌 Блоки с атрибутами (первые {ATTRIBUTED_SAMPLE_LIMIT}):")
+        samples = zip(blocks['name'], blocks['layer'], blocks['position'], blocks['attrs'])
+        for i, (name, layer, position, attrs) in enumerate(samples, 1):
+            print(f"\n   #{i}: Блок '{name}'")
+            print(f"        Слой: {layer}")
+            print(f"        Позиция: ({position[0]:.2f}, {position[1]:.2f}, {position[2]:.2f})")
             print(f"        Атрибуты:")
-            for tag, val in block['attrs'].items():
+            for tag, val in attrs.items():
                 print(f"           {tag}: {val}")
 
     # Рекомендации
@@ -178,10 +275,10 @@ def diagnose_text_and_layers():
         print(f"   Нужно использовать ТЕКСТОВЫЕ объекты для определения скважин,")
         print(f"   а не блоки. Возможно, рядом с текстами есть круги или другие маркеры.")
 
-    if blocks_on_skv_layers:
-        print(f"\n✅ Найдено {len(blocks_on_skv_layers)} блоков на слоях со 'СКВ'")
-        most_common_block = max(blocks_by_name.items(), key=lambda x: x[1])[0]
-        print(f"   Самый частый блок: '{most_common_block}' ({blocks_by_name[most_common_block]} вставок)")
+    if blocks_count:
+        print(f"\n✅ Найдено {blocks_count} блоков на слоях со 'СКВ'")
+        most_common_block, most_common_count = blocks_by_name.most_common(1)[0]
+        print(f"   Самый частый блок: '{most_common_block}' ({most_common_count} вставок)")
         print(f"\n💡 Возможно, скважины обозначены блоком '{most_common_block}'")
 
     print("\n" + "=" * 80)
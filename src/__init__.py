@@ -2,5 +2,42 @@
 Модуль для работы с AutoCAD файлами и определения номеров скважин.
 """
 
+import importlib
+
 __version__ = "0.1.0"
 
+# Публичные имена пакета и модули, в которых они определены. Модули
+# импортируются при первом обращении, чтобы `import src` не загружал
+# привязки COM и остальные модули пакета
+_LAZY_EXPORTS = {
+    'process_dwg_file': 'main',
+    'AutoCADHandler': 'autocad_handler',
+    'BoreholeProcessor': 'borehole_processor',
+    'ConsoleOutput': 'console_output',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    """
+    Ленивый импорт публичных имён пакета (PEP 562).
+
+    Args:
+        name: Имя атрибута пакета
+
+    Returns:
+        Объект из соответствующего модуля пакета
+    """
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """Список атрибутов пакета с учётом ленивых имён."""
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,284 @@
+"""
+Общие функции для работы с объектами AutoCAD через COM.
+Используются обработчиком AutoCAD и диагностическими скриптами.
+"""
+
+import contextlib
+from typing import Any, Dict, List
+
+# Сколько объектов коллекции запрашивается одним вызовом IEnumVARIANT::Next
+ENUM_BATCH_SIZE = 500
+
+# Режим SelectionSet.Select: выбрать все объекты чертежа (acSelectionSetAll)
+AC_SELECTION_SET_ALL = 5
+
+# Символы шаблонов DXF-фильтра, которые экранируются обратной кавычкой
+WILDCARD_SPECIAL_CHARS = frozenset('#@.*?~[]-,`')
+
+# DISPID свойств и методов по имени, на время работы процесса. DISPID задаётся
+# интерфейсом (Name у вставки блока и у листа - разные члены), поэтому кэш
+# ведётся отдельно для каждого интерфейса и передаётся в get_property:
+# ENTITY_DISPIDS - члены IAcadEntity (EntityName, Layer), которые все объекты
+# чертежа наследуют с тем же DISPID; BLOCK_REFERENCE_DISPIDS - члены
+# IAcadBlockReference (вставки блоков и MINSERT)
+ENTITY_DISPIDS: Dict[str, int] = {}
+BLOCK_REFERENCE_DISPIDS: Dict[str, int] = {}
+
+# DISPID членов IAcadAttributeReference, которые читает read_attributes
+_ATTRIBUTE_DISPIDS: Dict[str, int] = {}
+
+# Флаги IDispatch::Invoke (oaidl.h) - заданы константами, чтобы горячий цикл
+# не обращался к модулю pythoncom на каждое свойство
+DISPATCH_METHOD = 1
+DISPATCH_PROPERTYGET = 2
+
+
+def _dispid(dispatch, name: str, dispids: Dict[str, int]) -> int:
+    """
+    DISPID члена интерфейса, определяемый один раз за процесс.
+
+    Args:
+        dispatch: Объект PyIDispatch
+        name: Имя свойства или метода
+        dispids: Кэш DISPID интерфейса объекта
+
+    Returns:
+        int: DISPID
+    """
+    dispid = dispids.get(name)
+    if dispid is None:
+        dispid = dispids[name] = dispatch.GetIDsOfNames(name)
+    return dispid
+
+
+def _pywin32_dispatch(obj):
+    """
+    Интерфейс IDispatch объекта pywin32 без обращения к атрибутам объекта.
+
+    Динамические объекты comtypes (pyautocad) ищут любое неизвестное имя
+    через GetIDsOfNames и выбрасывают COMError, а не AttributeError, поэтому
+    hasattr/getattr для проверки типа объекта не подходят. Обёртки win32com
+    (CDispatch и классы makepy) хранят интерфейс в __dict__ под именем _oleobj_.
+
+    Args:
+        obj: Объект AutoCAD или коллекция
+
+    Returns:
+        PyIDispatch или None, если объект не из pywin32
+    """
+    # Тип сравнивается по имени, чтобы не импортировать pythoncom
+    # при работе через comtypes
+    if type(obj).__name__ == 'PyIDispatch':
+        return obj
+    try:
+        return vars(obj).get('_oleobj_')
+    except TypeError:
+        return None
+
+
+def get_property(entity, name: str, dispids: Dict[str, int]):
+    """
+    Чтение свойства объекта AutoCAD.
+
+    У объектов pywin32 (PyIDispatch или обёртка win32com) свойство читается
+    через IDispatch::Invoke по DISPID, который определяется один раз за
+    процесс: без поиска имени в обёртке и без приведения к конкретному
+    интерфейсу. Объекты comtypes (pyautocad) читаются обычным обращением
+    к атрибуту.
+
+    Args:
+        entity: Объект AutoCAD
+        name: Имя свойства
+        dispids: Кэш DISPID интерфейса, которому принадлежит свойство
+            (ENTITY_DISPIDS, BLOCK_REFERENCE_DISPIDS)
+
+    Returns:
+        Значение свойства
+    """
+    oleobj = _pywin32_dispatch(entity)
+    if oleobj is None:
+        return getattr(entity, name)
+    return oleobj.Invoke(_dispid(oleobj, name, dispids), 0, DISPATCH_PROPERTYGET, True)
+
+
+def read_attributes(entity) -> Dict[str, str]:
+    """
+    Чтение атрибутов вставки блока.
+
+    У объектов pywin32 GetAttributes, TagString и TextString вызываются по
+    DISPID из кэшей IAcadBlockReference и IAcadAttributeReference: атрибуты
+    приходят одним массивом без обёрток CDispatch (каждая обёртка
+    запрашивает описание типа).
+
+    Args:
+        entity: Вставка блока
+
+    Returns:
+        Dict[str, str]: Словарь тег -> значение (пустой при ошибке)
+    """
+    try:
+        oleobj = _pywin32_dispatch(entity)
+        if oleobj is None:
+            return {attr.TagString: attr.TextString for attr in entity.GetAttributes()}
+
+        get_attributes = _dispid(oleobj, 'GetAttributes', BLOCK_REFERENCE_DISPIDS)
+        attrs = oleobj.Invoke(get_attributes, 0, DISPATCH_METHOD, True)
+        if not attrs:
+            return {}
+
+        tag_id = _dispid(attrs[0], 'TagString', _ATTRIBUTE_DISPIDS)
+        text_id = _dispid(attrs[0], 'TextString', _ATTRIBUTE_DISPIDS)
+        get = DISPATCH_PROPERTYGET
+        return {attr.Invoke(tag_id, 0, get, True): attr.Invoke(text_id, 0, get, True) for attr in attrs}
+    except Exception:
+        return {}
+
+
+def iter_batches(collection, batch_size: int = ENUM_BATCH_SIZE):
+    """
+    Перебор коллекции AutoCAD пачками через IEnumVARIANT.
+
+    Обычный `for entity in collection` вызывает IEnumVARIANT::Next(1) на каждый
+    объект - по одному межпроцессному вызову на элемент. Здесь за один вызов
+    запрашивается до batch_size объектов. Поддерживаются обёртки win32com и
+    comtypes (pyautocad); прочие коллекции перебираются как обычно.
+
+    Объекты коллекции win32com выдаются как PyIDispatch без обёрток CDispatch:
+    обёртка запрашивает описание типа через COM на каждый объект. Свойства
+    читаются через get_property, обёртка при необходимости создаётся
+    вызывающим кодом (win32com.client.Dispatch).
+
+    Args:
+        collection: Коллекция AutoCAD (ModelSpace, Block, SelectionSet и т.д.)
+        batch_size: Размер пачки
+
+    Yields:
+        List: Объекты коллекции одной пачки
+    """
+    oleobj = _pywin32_dispatch(collection)
+    if oleobj is not None:
+        import pythoncom
+
+        enum = oleobj.Invoke(
+            pythoncom.DISPID_NEWENUM, 0,
+            pythoncom.DISPATCH_METHOD | pythoncom.DISPATCH_PROPERTYGET, 1
+        ).QueryInterface(pythoncom.IID_IEnumVARIANT)
+        while True:
+            batch = enum.Next(batch_size)
+            if not batch:
+                return
+            yield batch
+
+    # Коллекции comtypes (динамические и с ранним связыванием) возвращают
+    # из iter() сам IEnumVARIANT; метод Next ищется у типа, а не у объекта
+    enum = iter(collection)
+    if hasattr(type(enum), 'Next'):
+        while True:
+            # При batch_size == 1 comtypes возвращает не список, а пару
+            # (объект, число полученных объектов)
+            if batch_size == 1:
+                item, fetched = enum.Next(1)
+                batch = [item] if fetched else []
+            else:
+                batch = enum.Next(batch_size)
+            if not batch:
+                return
+            yield batch
+
+    else:
+        batch = []
+        for entity in enum:
+            batch.append(entity)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def wildcard_literal(text: str) -> str:
+    """
+    Экранирование строки для точного совпадения в DXF-фильтре.
+
+    Символы шаблонов (#, @, ., *, ?, ~, [, ], -, запятая и обратная кавычка)
+    экранируются обратной кавычкой.
+
+    Args:
+        text: Исходная строка, например имя слоя
+
+    Returns:
+        str: Шаблон, совпадающий только с этой строкой
+    """
+    return ''.join('`' + char if char in WILDCARD_SPECIAL_CHARS else char for char in text)
+
+
+def case_pattern(text: str, prefix: str, suffix: str) -> str:
+    """
+    Шаблон DXF-фильтра для строки в разных регистрах.
+
+    Args:
+        text: Искомая строка
+        prefix: Шаблон перед строкой ('*' или '')
+        suffix: Шаблон после строки ('*' или '')
+
+    Returns:
+        str: Шаблон вида "<prefix>abc<suffix>,<prefix>Abc<suffix>,<prefix>ABC<suffix>"
+            с экранированными символами шаблонов
+    """
+    variants = dict.fromkeys((text.lower(), text.capitalize(), text.upper()))
+    return ','.join(prefix + wildcard_literal(variant) + suffix for variant in variants)
+
+
+def select_all(selection, filter_codes: List[int], filter_values: List[Any]) -> None:
+    """
+    Заполнение набора выбора объектами чертежа по фильтру DXF-кодов.
+
+    Args:
+        selection: Набор выбора AutoCAD (обёртка win32com или comtypes)
+        filter_codes: DXF-коды фильтра (0 - тип, 2 - имя блока, 8 - слой, 410 - лист)
+        filter_values: Значения для каждого кода
+    """
+    if _pywin32_dispatch(selection) is not None:
+        import pythoncom
+        import win32com.client
+
+        filter_type = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I2, list(filter_codes))
+        filter_data = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_VARIANT, list(filter_values))
+        selection.Select(AC_SELECTION_SET_ALL, pythoncom.Empty, pythoncom.Empty, filter_type, filter_data)
+    else:
+        import array
+
+        selection.Select(AC_SELECTION_SET_ALL, FilterType=array.array('h', filter_codes),
+                         FilterData=list(filter_values))
+
+
+@contextlib.contextmanager
+def selected_entities(doc, filter_codes: List[int], filter_values: List[Any], name: str):
+    """
+    Выборка объектов чертежа фильтром по DXF-кодам.
+
+    Фильтр выполняется внутри acad.exe, поэтому через COM передаются только
+    подходящие объекты, а не всё пространство модели. Набор удаляется
+    при выходе из контекста, в том числе если выборка не выполнена.
+
+    Args:
+        doc: Документ AutoCAD
+        filter_codes: DXF-коды фильтра (0 - тип, 2 - имя блока, 8 - слой, 410 - лист)
+        filter_values: Значения для каждого кода
+        name: Имя набора выбора
+
+    Yields:
+        Набор выбора AutoCAD с подходящими объектами
+    """
+    selection_sets = doc.SelectionSets
+    # Набор с таким именем мог остаться после прерванного запуска
+    with contextlib.suppress(Exception):
+        selection_sets.Item(name).Delete()
+
+    selection = selection_sets.Add(name)
+    try:
+        select_all(selection, filter_codes, filter_values)
+        yield selection
+    finally:
+        with contextlib.suppress(Exception):
+            selection.Delete()
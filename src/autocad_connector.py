@@ -5,20 +5,286 @@
 
 import os
 import time
+import atexit
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+import contextlib
+from typing import Optional, Dict, List, NamedTuple
 from abc import ABC, abstractmethod
+from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Пауза перед следующим коннектором после временной ошибки COM, сек:
+# начинается с RETRY_BASE_DELAY и удваивается до RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+
+# Неудача быстрее этого порога (сек) означает, что COM-сервер отвечает
+# отказом сразу - только тогда перед следующей попыткой нужна пауза
+FAST_FAILURE_THRESHOLD = 0.05
+
+# Сколько секунд неудачный поиск запущенного AutoCAD версии в ROT считается
+# актуальным: следующие коннекторы не повторяют тот же запрос
+RECENT_FAILURE_WINDOW = 0.5
+
+# Интервал обработки сообщений COM во время паузы между коннекторами, сек
+PUMP_INTERVAL = 0.02
+
+# Сколько секунд считается действительной последняя проверка, что AutoCAD
+# ещё доступен: частые повторные connect() не обращаются к COM каждый раз
+LIVENESS_TTL = 0.25
+
+# Версии AutoCAD для попытки подключения (Win32COMConnector и ComTypesConnector)
+AUTOCAD_PROGIDS = [
+    "AutoCAD.Application.25",  # 2025 (работает по диагностике)
+    "AutoCAD.Application.24",  # 2024
+    "AutoCAD.Application.26",  # 2026
+    "AutoCAD.Application"      # Общая версия
+]
+
+# Файлы с последней версией AutoCAD и последним коннектором, через
+# которые удалось подключиться
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'borehole-velta')
+PROGID_CACHE_PATH = os.path.join(CACHE_DIR, 'acad_progid')
+CONNECTOR_CACHE_PATH = os.path.join(CACHE_DIR, 'acad_connector')
+
+# Рабочая версия AutoCAD (общая для всех коннекторов) и версии,
+# не зарегистрированные в системе, - на время работы процесса
+_cached_progid: Optional[str] = None
+_unregistered_progids = set()
+
+# Время (monotonic) последнего неудачного GetActiveObject по ProgID
+_recent_failures: Dict[str, float] = {}
+
+# Состояние COM потока: инициализация COM действует на поток, а не на процесс
+_com_state = threading.local()
+
+
+class _ComApartmentRelease:
+    """
+    Освобождение COM рабочего потока.
+
+    Хранится в локальных данных потока, которые удаляются при его завершении
+    в том же потоке, - CoUninitialize вызывается парно CoInitializeEx.
+    """
+
+    def __del__(self):
+        import pythoncom
+
+        pythoncom.CoUninitialize()
+
+
+def _ensure_com_initialized() -> None:
+    """
+    Однократная для потока инициализация COM в однопоточном апартаменте (STA).
+
+    AutoCAD работает только с STA. Апартамент инициализируется явно один раз
+    на поток, а не неявно при первом Dispatch, и освобождается в том же
+    потоке: для главного - при завершении процесса, для остальных - при
+    завершении потока. Объекты AutoCAD используются в том потоке, где
+    выполнено подключение; в рабочие потоки они передаются маршалингом
+    (см. diagnose_core.submit_com_task).
+    """
+    if getattr(_com_state, 'initialized', False):
+        return
+    try:
+        import pythoncom
+    except ImportError:
+        # Без pywin32 инициализирует COM сам comtypes
+        return
+    try:
+        pythoncom.CoInitializeEx(pythoncom.COINIT_APARTMENTTHREADED)
+    except pythoncom.com_error as e:
+        # Поток уже инициализирован в другом режиме - оставляем как есть
+        logger.debug(f"COM уже инициализирован: {e}")
+    else:
+        # Обработчики atexit выполняются в главном потоке
+        if threading.current_thread() is threading.main_thread():
+            atexit.register(pythoncom.CoUninitialize)
+        else:
+            _com_state.release = _ComApartmentRelease()
+    _com_state.initialized = True
+
+
+def _read_cache_file(path: str) -> Optional[str]:
+    """
+    Чтение значения из файла кэша подключения.
+
+    Args:
+        path: Путь к файлу кэша
+
+    Returns:
+        Optional[str]: Сохранённое значение или None, если файла нет
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_cache_file(path: str, value: str) -> None:
+    """
+    Запись значения в файл кэша подключения. Ошибки записи не критичны.
+
+    Args:
+        path: Путь к файлу кэша
+        value: Сохраняемое значение
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(value)
+    except OSError as e:
+        logger.debug(f"Не удалось сохранить кэш {path}: {e}")
+
+
+def _load_cached_progid() -> Optional[str]:
+    """
+    Последняя рабочая версия AutoCAD: из памяти процесса или из файла кэша.
+
+    Returns:
+        Optional[str]: ProgID или None, если подключений ещё не было
+    """
+    global _cached_progid
+    if _cached_progid is None:
+        _cached_progid = _read_cache_file(PROGID_CACHE_PATH)
+    return _cached_progid
+
+
+def _save_cached_progid(progid: str) -> None:
+    """
+    Сохранение рабочей версии AutoCAD в памяти процесса и в файле кэша.
+
+    Args:
+        progid: ProgID, через который удалось подключиться
+    """
+    global _cached_progid
+    if progid == _cached_progid:
+        return
+    _cached_progid = progid
+    _write_cache_file(PROGID_CACHE_PATH, progid)
+
+
+def _remember_failure(progid: str) -> None:
+    """
+    Запоминание неудачного поиска запущенного AutoCAD версии progid.
+
+    Args:
+        progid: ProgID, для которого GetActiveObject завершился ошибкой
+    """
+    _recent_failures[progid] = time.monotonic()
+
+
+def _recently_failed(progid: str) -> bool:
+    """
+    Проверка, что запущенный AutoCAD версии progid не находился только что.
+
+    Args:
+        progid: ProgID AutoCAD
+
+    Returns:
+        bool: True если GetActiveObject для progid завершился ошибкой
+            не раньше RECENT_FAILURE_WINDOW секунд назад
+    """
+    failed_at = _recent_failures.get(progid)
+    return failed_at is not None and time.monotonic() - failed_at < RECENT_FAILURE_WINDOW
+
+
+def _progids_to_try() -> List[str]:
+    """
+    Версии AutoCAD в порядке попыток: сначала последняя рабочая, без
+    версий, уже признанных незарегистрированными.
+
+    Returns:
+        List[str]: Список ProgID
+    """
+    cached = _load_cached_progid()
+    progids = [cached] if cached else []
+    progids.extend(progid for progid in AUTOCAD_PROGIDS if progid != cached)
+    return [progid for progid in progids if progid not in _unregistered_progids]
+
+
+def _early_bound(application):
+    """
+    Обёртка объекта приложения AutoCAD с ранним связыванием.
+
+    gencache.EnsureDispatch генерирует (или берёт из кэша gen_py) модуль
+    библиотеки типов, и свойства вызываются по известным DISPID без
+    GetIDsOfNames на каждое обращение. Модуль сохраняется в кэше gen_py
+    (обычно %TEMP%\\gen_py), поэтому генерация выполняется один раз.
+    Если кэш недоступен или повреждён, возвращается исходный объект.
+
+    Args:
+        application: Объект приложения AutoCAD (win32com)
+
+    Returns:
+        Объект приложения с ранним связыванием или исходный объект
+    """
+    import win32com.client
+
+    try:
+        return win32com.client.gencache.EnsureDispatch(application._oleobj_)
+    except Exception as e:
+        logger.debug(f"Раннее связывание недоступно, используется позднее: {e}")
+        return application
+
+
+class ConnectionInfo(NamedTuple):
+    """Информация о текущем подключении к AutoCAD."""
+    method: str
+    connected: bool
+    has_application: bool
+    has_document: bool
+
+
+# Информация при отсутствии подключения
+NO_CONNECTION = ConnectionInfo(method='None', connected=False, has_application=False, has_document=False)
+
+
+class FailureReason(Enum):
+    """Причина неудачного подключения."""
+    IMPORT_FAILED = 'import_failed'            # Библиотека не установлена
+    COM_ERROR = 'com_error'                    # Ошибка COM, может пройти при повторе
+    NO_ACTIVE_DOCUMENT = 'no_active_document'  # AutoCAD запущен, но документ не открыт
+
+    @property
+    def is_transient(self) -> bool:
+        """Имеет ли смысл подождать перед следующей попыткой."""
+        return self is FailureReason.COM_ERROR
+
 
 class AutoCADConnector(ABC):
     """Абстрактный базовый класс для подключения к AutoCAD."""
+
+    # Причина последней неудачи connect(), None после успеха
+    failure: Optional[FailureReason] = None
     
     @abstractmethod
     def connect(self) -> bool:
         """Подключение к AutoCAD."""
         pass
+
+    def _fail(self, error: Optional[Exception] = None,
+              reason: Optional[FailureReason] = None) -> bool:
+        """
+        Запоминание причины неудачного подключения.
+
+        Args:
+            error: Исключение, из-за которого подключение не удалось
+            reason: Причина, если она известна без исключения
+
+        Returns:
+            bool: Всегда False - результат connect()
+        """
+        if reason is not None:
+            self.failure = reason
+        elif isinstance(error, ImportError):
+            self.failure = FailureReason.IMPORT_FAILED
+        else:
+            self.failure = FailureReason.COM_ERROR
+        return False
     
     @abstractmethod
     def get_application(self):
@@ -36,24 +302,138 @@ class AutoCADConnector(ABC):
         pass
 
 
-class PyAutoCADConnector(AutoCADConnector):
-    """Подключение через pyautocad."""
+class _BaseComConnector(AutoCADConnector):
+    """
+    Общая часть коннекторов: объекты приложения и документа, поиск и запуск
+    AutoCAD по ProgID и открытие файла через коллекцию Documents.
+    """
+
+    # Название библиотеки подключения для сообщений
+    library = 'COM'
     
     def __init__(self):
         self.acad = None
         self.doc = None
         self.is_connected = False
     
+    def get_application(self):
+        return self.acad
+    
+    def get_active_document(self):
+        return self.doc
+    
+    def open_document(self, file_path: str) -> bool:
+        try:
+            if self.acad:
+                self.doc = self.acad.Documents.Open(file_path)
+                self.acad.ActiveDocument = self.doc
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка открытия документа через {self.library}: {e}")
+        return False
+
+    def _attach_or_create(self, progid_to_clsid, get_active, create, errors) -> None:
+        """
+        Подключение к запущенному AutoCAD или запуск нового экземпляра.
+
+        Незарегистрированные версии отсекаются чтением реестра, без обращения
+        к ROT и попытки запуска. Затем ищется уже запущенный AutoCAD любой
+        версии: запрос к ROT быстрый, а запуск нового экземпляра занимает
+        секунды. Новый экземпляр создаётся, только если ни одна версия не
+        запущена.
+
+        Args:
+            progid_to_clsid: Чтение CLSID версии из реестра по ProgID
+            get_active: Получение запущенного экземпляра по ProgID
+            create: Запуск нового экземпляра по ProgID
+            errors: Исключения библиотеки при неудачном вызове
+
+        Raises:
+            Exception: Не удалось подключиться ни к одной версии AutoCAD
+        """
+        registered = []
+        for version in _progids_to_try():
+            try:
+                progid_to_clsid(version)
+            except errors:
+                logger.debug(f"AutoCAD {version} не зарегистрирован")
+                _unregistered_progids.add(version)
+                continue
+            registered.append(version)
+
+        connected_version = None
+        for version in registered:
+            if _recently_failed(version):
+                continue
+            with contextlib.suppress(*errors):
+                self.acad = get_active(version)
+                logger.info(f"✅ Подключение к существующему AutoCAD {version} через {self.library}")
+                connected_version = version
+                break
+            _remember_failure(version)
+        else:
+            for version in registered:
+                with contextlib.suppress(*errors):
+                    self.acad = create(version)
+                    logger.info(f"✅ Создание нового экземпляра AutoCAD {version} через {self.library}")
+                    connected_version = version
+                    break
+
+        if connected_version is None:
+            raise Exception("Не удалось подключиться ни к одной версии AutoCAD")
+
+        # Следующее подключение начнётся с этой версии
+        _save_cached_progid(connected_version)
+
+    def _open_or_create_document(self, errors) -> bool:
+        """
+        Активный документ AutoCAD или новый, если активного нет.
+
+        Documents.Add() возвращает созданный документ - повторно
+        ActiveDocument не запрашивается.
+
+        Args:
+            errors: Исключения библиотеки при неудачном вызове
+
+        Returns:
+            bool: False, если документ получить и создать не удалось
+        """
+        errors = errors + (AttributeError,)
+        try:
+            self.doc = self.acad.ActiveDocument
+            if self.doc is None:
+                # Создаем новый документ, если нет активного
+                logger.info("📄 Создание нового документа в AutoCAD...")
+                self.doc = self.acad.Documents.Add()
+                logger.info("✅ Новый документ создан")
+        except errors as doc_error:
+            logger.warning(f"⚠️ Проблема с документом: {doc_error}")
+            # Пытаемся создать новый документ
+            try:
+                self.doc = self.acad.Documents.Add()
+                logger.info("✅ Новый документ создан после ошибки")
+            except errors as create_error:
+                logger.error(f"❌ Не удалось создать документ: {create_error}")
+                return self._fail(create_error)
+        return True
+
+
+class PyAutoCADConnector(_BaseComConnector):
+    """Подключение через pyautocad."""
+
+    library = 'pyautocad'
+    
     def connect(self) -> bool:
         """Подключение через pyautocad."""
         try:
+            from comtypes import COMError
             from pyautocad import Autocad
             
             # Сначала пытаемся подключиться к существующему AutoCAD
             try:
                 self.acad = Autocad(create_if_not_exists=False)
                 logger.info("✅ Подключение к существующему AutoCAD через pyautocad")
-            except:
+            except (COMError, OSError):
                 # Если не удалось, создаем новый экземпляр
                 self.acad = Autocad(create_if_not_exists=True)
                 logger.info("✅ Создание нового экземпляра AutoCAD через pyautocad")
@@ -63,202 +443,91 @@ class PyAutoCADConnector(AutoCADConnector):
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка подключения через pyautocad: {e}")
-            return False
-    
-    def get_application(self):
-        return self.acad
-    
-    def get_active_document(self):
-        return self.doc
-    
-    def open_document(self, file_path: str) -> bool:
-        try:
-            if self.acad:
-                self.acad.ActiveDocument = self.acad.Documents.Open(file_path)
-                self.doc = self.acad.ActiveDocument
-                return True
-        except Exception as e:
-            logger.error(f"Ошибка открытия документа через pyautocad: {e}")
-        return False
+            return self._fail(e)
 
 
-class Win32COMConnector(AutoCADConnector):
+class Win32COMConnector(_BaseComConnector):
     """Подключение через win32com."""
-    
-    def __init__(self):
-        self.acad = None
-        self.doc = None
-        self.is_connected = False
+
+    library = 'win32com'
     
     def connect(self) -> bool:
         """Подключение через win32com."""
         try:
+            import pythoncom
             import win32com.client
-            
-            # Список версий AutoCAD для попытки подключения
-            autocad_versions = [
-                "AutoCAD.Application.25",  # 2025 (работает по диагностике)
-                "AutoCAD.Application.24",  # 2024
-                "AutoCAD.Application.26",  # 2026
-                "AutoCAD.Application"      # Общая версия
-            ]
-            
-            for version in autocad_versions:
-                try:
-                    # Пытаемся подключиться к существующему AutoCAD
-                    self.acad = win32com.client.GetActiveObject(version)
-                    logger.info(f"✅ Подключение к существующему AutoCAD {version} через win32com")
-                    break
-                except:
-                    try:
-                        # Создаем новый экземпляр
-                        self.acad = win32com.client.Dispatch(version)
-                        logger.info(f"✅ Создание нового экземпляра AutoCAD {version} через win32com")
-                        break
-                    except:
-                        continue
-            else:
-                raise Exception("Не удалось подключиться ни к одной версии AutoCAD")
-            
-            # Проверяем, есть ли активный документ
-            try:
-                self.doc = self.acad.ActiveDocument
-                if self.doc is None:
-                    # Создаем новый документ, если нет активного
-                    logger.info("📄 Создание нового документа в AutoCAD...")
-                    self.acad.Documents.Add()
-                    self.doc = self.acad.ActiveDocument
-                    logger.info("✅ Новый документ создан")
-            except Exception as doc_error:
-                logger.warning(f"⚠️ Проблема с документом: {doc_error}")
-                # Пытаемся создать новый документ
-                try:
-                    self.acad.Documents.Add()
-                    self.doc = self.acad.ActiveDocument
-                    logger.info("✅ Новый документ создан после ошибки")
-                except Exception as create_error:
-                    logger.error(f"❌ Не удалось создать документ: {create_error}")
-                    return False
+
+            errors = (pythoncom.com_error,)
+            self._attach_or_create(pythoncom.CLSIDFromProgID, win32com.client.GetActiveObject,
+                                   win32com.client.Dispatch, errors)
+            self.acad = _early_bound(self.acad)
+
+            if not self._open_or_create_document(errors):
+                return False
             
             self.is_connected = True
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка подключения через win32com: {e}")
-            return False
-    
-    def get_application(self):
-        return self.acad
-    
-    def get_active_document(self):
-        return self.doc
-    
-    def open_document(self, file_path: str) -> bool:
-        try:
-            if self.acad:
-                self.acad.ActiveDocument = self.acad.Documents.Open(file_path)
-                self.doc = self.acad.ActiveDocument
-                return True
-        except Exception as e:
-            logger.error(f"Ошибка открытия документа через win32com: {e}")
-        return False
+            return self._fail(e)
 
 
-class ComTypesConnector(AutoCADConnector):
+class ComTypesConnector(_BaseComConnector):
     """Подключение через comtypes."""
-    
-    def __init__(self):
-        self.acad = None
-        self.doc = None
-        self.is_connected = False
+
+    library = 'comtypes'
     
     def connect(self) -> bool:
         """Подключение через comtypes."""
         try:
+            import comtypes
             import comtypes.client
-            
-            # Список версий AutoCAD для попытки подключения
-            autocad_versions = [
-                "AutoCAD.Application.25",  # 2025 (работает по диагностике)
-                "AutoCAD.Application.24",  # 2024
-                "AutoCAD.Application.26",  # 2026
-                "AutoCAD.Application"      # Общая версия
-            ]
-            
-            for version in autocad_versions:
-                try:
-                    # Пытаемся подключиться к существующему AutoCAD
-                    self.acad = comtypes.client.GetActiveObject(version)
-                    logger.info(f"✅ Подключение к существующему AutoCAD {version} через comtypes")
-                    break
-                except:
-                    try:
-                        # Создаем новый экземпляр
-                        self.acad = comtypes.client.CreateObject(version)
-                        logger.info(f"✅ Создание нового экземпляра AutoCAD {version} через comtypes")
-                        break
-                    except:
-                        continue
-            else:
-                raise Exception("Не удалось подключиться ни к одной версии AutoCAD")
-            
-            # Проверяем, есть ли активный документ
-            try:
-                self.doc = self.acad.ActiveDocument
-                if self.doc is None:
-                    # Создаем новый документ, если нет активного
-                    logger.info("📄 Создание нового документа в AutoCAD...")
-                    self.acad.Documents.Add()
-                    self.doc = self.acad.ActiveDocument
-                    logger.info("✅ Новый документ создан")
-            except Exception as doc_error:
-                logger.warning(f"⚠️ Проблема с документом: {doc_error}")
-                # Пытаемся создать новый документ
-                try:
-                    self.acad.Documents.Add()
-                    self.doc = self.acad.ActiveDocument
-                    logger.info("✅ Новый документ создан после ошибки")
-                except Exception as create_error:
-                    logger.error(f"❌ Не удалось создать документ: {create_error}")
-                    return False
+            from comtypes import COMError
+
+            errors = (COMError, OSError)
+            self._attach_or_create(comtypes.GUID.from_progid, comtypes.client.GetActiveObject,
+                                   comtypes.client.CreateObject, errors)
+
+            if not self._open_or_create_document(errors):
+                return False
             
             self.is_connected = True
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка подключения через comtypes: {e}")
-            return False
-    
-    def get_application(self):
-        return self.acad
-    
-    def get_active_document(self):
-        return self.doc
-    
-    def open_document(self, file_path: str) -> bool:
-        try:
-            if self.acad:
-                self.acad.ActiveDocument = self.acad.Documents.Open(file_path)
-                self.doc = self.acad.ActiveDocument
-                return True
-        except Exception as e:
-            logger.error(f"Ошибка открытия документа через comtypes: {e}")
-        return False
+            return self._fail(e)
 
 
-class DirectAutoCADConnector(AutoCADConnector):
+# Версия AutoCAD для DirectAutoCADConnector (рабочая по диагностике)
+DIRECT_PROGID = "AutoCAD.Application.25"
+
+
+class DirectAutoCADConnector(_BaseComConnector):
     """Прямое подключение к AutoCAD.Application.25 (рабочая версия)."""
     
     def __init__(self):
-        self.acad = None
-        self.doc = None
-        self.is_connected = False
+        super().__init__()
+        # Индекс открытых документов и число документов, для которого он построен
+        self._doc_index: Dict[str, int] = {}
+        self._doc_index_count: Optional[int] = None
+        # Коллекция Documents: запрашивается один раз на подключение
+        self._documents = None
+        # Имя текущего документа, прочитанное при подключении или открытии
+        self.doc_name: Optional[str] = None
     
     def connect(self) -> bool:
         """Прямое подключение к AutoCAD.Application.25."""
         try:
+            import pythoncom
             import win32com.client
             
             # Используем только рабочую версию из диагностики
-            self.acad = win32com.client.GetActiveObject("AutoCAD.Application.25")
+            try:
+                self.acad = _early_bound(win32com.client.GetActiveObject(DIRECT_PROGID))
+            except pythoncom.com_error:
+                # Остальные коннекторы не будут повторно искать эту версию в ROT
+                _remember_failure(DIRECT_PROGID)
+                raise
             
             # Проверяем, есть ли активный документ
             try:
@@ -266,28 +535,31 @@ class DirectAutoCADConnector(AutoCADConnector):
                 if self.doc is None:
                     # НЕ создаем новый документ автоматически
                     logger.warning("⚠️ Нет активного документа. Документ должен быть открыт вручную.")
-                    return False
+                    return self._fail(reason=FailureReason.NO_ACTIVE_DOCUMENT)
                 else:
-                    doc_name = getattr(self.doc, 'Name', 'Unknown')
-                    logger.info(f"📄 Активный документ: {doc_name}")
-            except Exception as doc_error:
-                logger.warning(f"⚠️ Проблема с документом: {doc_error}")
-                # НЕ создаем новый документ автоматически
-                logger.warning("⚠️ Не удалось получить активный документ. Документ должен быть открыт вручную.")
-                return False
+                    self.doc_name = self.doc.Name
+                    logger.info(f"📄 Активный документ: {self.doc_name}")
+            except (pythoncom.com_error, AttributeError) as doc_error:
+                # Документа нет, только если коллекция Documents пуста. Прочие
+                # ошибки (например, занятый AutoCAD отклонил вызов) временные -
+                # перебор коннекторов продолжается с паузой
+                try:
+                    no_documents = self.acad.Documents.Count == 0
+                except (pythoncom.com_error, AttributeError):
+                    no_documents = False
+                if no_documents:
+                    # НЕ создаем новый документ автоматически
+                    logger.warning("⚠️ Нет открытых документов. Документ должен быть открыт вручную.")
+                    return self._fail(doc_error, FailureReason.NO_ACTIVE_DOCUMENT)
+                logger.warning(f"⚠️ Не удалось получить активный документ: {doc_error}")
+                return self._fail(doc_error)
             
             self.is_connected = True
             logger.info("✅ Прямое подключение к AutoCAD.Application.25 успешно")
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка прямого подключения к AutoCAD.Application.25: {e}")
-            return False
-    
-    def get_application(self):
-        return self.acad
-    
-    def get_active_document(self):
-        return self.doc
+            return self._fail(e)
     
     def open_document(self, file_path: str) -> bool:
         """
@@ -295,40 +567,62 @@ class DirectAutoCADConnector(AutoCADConnector):
         """
         try:
             if self.acad:
+                from pywintypes import com_error
+
                 expected_name = os.path.basename(file_path)
+                # Нормализованное имя для сравнения вычисляется один раз
+                expected_key = os.path.normcase(expected_name)
+
+                # Нужный чертёж уже активен с момента подключения: имя известно,
+                # обращаться к Documents не нужно
+                if self.doc is not None and self.doc_name is not None \
+                        and os.path.normcase(self.doc_name) == expected_key:
+                    logger.info(f"✅ Нужный документ уже активен: {self.doc_name}")
+                    return True
 
-                # Пытаемся получить список всех открытых документов
                 try:
-                    doc_count = self.acad.Documents.Count
-                    logger.info(f"📂 Найдено {doc_count} открытых документов")
+                    if self._documents is None:
+                        self._documents = self.acad.Documents
+                    documents = self._documents
 
-                    for i in range(doc_count):
-                        doc = self.acad.Documents.Item(i)
-                        doc_name = getattr(doc, 'Name', 'Unknown')
-                        logger.info(f"   {i+1}. {doc_name}")
+                    # Documents.Item принимает имя файла - один вызов вместо
+                    # обхода всех открытых документов
+                    doc = None
+                    with contextlib.suppress(com_error):
+                        doc = documents.Item(expected_name)
 
-                        if doc_name.lower() == expected_name.lower():
-                            logger.info(f"✅ Найден нужный документ: {doc_name}")
-                            self.doc = doc
-                            self.acad.ActiveDocument = doc  # Делаем его активным
-                            return True
+                    # Чертёж, зарегистрированный в ROT, находится одним
+                    # запросом без обхода коллекции Documents
+                    if doc is None:
+                        doc = self._running_document(file_path, expected_key)
+
+                    if doc is None:
+                        doc = self._indexed_document(documents, expected_key)
+
+                    if doc is not None:
+                        self.doc_name = doc.Name
+                        logger.info(f"✅ Найден нужный документ: {self.doc_name}")
+                        self.doc = doc
+                        self.acad.ActiveDocument = doc  # Делаем его активным
+                        return True
 
                     logger.warning(f"⚠️ Документ '{expected_name}' не найден среди открытых")
                     logger.warning("Откройте нужный файл в AutoCAD и запустите скрипт снова")
                     return False
 
-                except Exception as docs_error:
+                except (com_error, AttributeError) as docs_error:
                     # Если Documents не работает, пытаемся через ActiveDocument
                     logger.warning(f"⚠️ Documents не работает: {docs_error}")
                     logger.info("Проверяем активный документ...")
 
                     current_doc = self.acad.ActiveDocument
-                    current_name = getattr(current_doc, 'Name', 'Unknown')
+                    current_name = current_doc.Name
                     logger.info(f"📄 Активный документ: {current_name}")
 
-                    if current_name.lower() == expected_name.lower():
+                    if os.path.normcase(current_name) == expected_key:
                         logger.info("✅ Активный документ соответствует ожидаемому")
                         self.doc = current_doc
+                        self.doc_name = current_name
                         return True
                     else:
                         logger.warning(f"⚠️ Ожидается: {expected_name}, активен: {current_name}")
@@ -339,51 +633,251 @@ class DirectAutoCADConnector(AutoCADConnector):
             logger.error(f"Ошибка открытия документа: {e}")
         return False
 
+    def _running_document(self, file_path: str, expected_key: str):
+        """
+        Поиск открытого чертежа в Running Object Table по файловому моникеру.
+
+        Используется только ROT: в отличие от CoGetObject, документ не
+        открывается, если он не зарегистрирован. AutoCAD регистрирует
+        чертежи в ROT не всегда, поэтому None - обычный результат.
+
+        Args:
+            file_path: Путь к .dwg файлу
+            expected_key: Имя файла, нормализованное os.path.normcase
+
+        Returns:
+            Документ AutoCAD или None, если в ROT его нет
+        """
+        import pythoncom
+        import win32com.client
+
+        try:
+            moniker = pythoncom.CreateFileMoniker(os.path.abspath(file_path))
+            running = pythoncom.GetRunningObjectTable().GetObject(moniker)
+            doc = win32com.client.Dispatch(running.QueryInterface(pythoncom.IID_IDispatch))
+            if os.path.normcase(doc.Name) == expected_key:
+                return doc
+        except (pythoncom.com_error, AttributeError):
+            pass
+        return None
+
+    def _indexed_document(self, documents, expected_key: str):
+        """
+        Поиск открытого документа по индексу имён.
+
+        Число документов не меняется, если один чертёж закрыли, а другой
+        открыли, поэтому индекс может указывать на другой документ. Имя
+        найденного документа сверяется с ожидаемым; при несовпадении или
+        промахе индекс пересобирается и поиск повторяется.
+
+        Args:
+            documents: Коллекция Documents AutoCAD
+            expected_key: Имя файла, нормализованное os.path.normcase
+
+        Returns:
+            Документ AutoCAD или None, если он не открыт
+        """
+        for refresh in (False, True):
+            index = self._document_index(documents, refresh).get(expected_key)
+            if index is None:
+                continue
+            doc = documents.Item(index)
+            if os.path.normcase(doc.Name) == expected_key:
+                return doc
+        return None
+
+    def _document_index(self, documents, refresh: bool = False) -> Dict[str, int]:
+        """
+        Индекс открытых документов по имени файла.
+
+        Индекс пересобирается, если изменилось число открытых документов или
+        запрошено обновление. Документы запрашиваются одним вызовом
+        IEnumVARIANT::Next вместо Documents.Item(i) на каждый документ.
+
+        Args:
+            documents: Коллекция Documents AutoCAD
+            refresh: Пересобрать индекс независимо от числа документов
+
+        Returns:
+            Dict[str, int]: Имя документа (os.path.normcase) -> индекс в коллекции
+        """
+        doc_count = documents.Count
+        if refresh or doc_count != self._doc_index_count:
+            import pythoncom
+            import win32com.client
+            from pywintypes import com_error
+
+            logger.info(f"📂 Найдено {doc_count} открытых документов")
+            enum = documents._oleobj_.Invoke(
+                pythoncom.DISPID_NEWENUM, 0,
+                pythoncom.DISPATCH_METHOD | pythoncom.DISPATCH_PROPERTYGET, 1
+            ).QueryInterface(pythoncom.IID_IEnumVARIANT)
+
+            # Строки для списка документов формируются, только если INFO включён
+            log_info = logger.isEnabledFor(logging.INFO)
+
+            index = {}
+            for i, item in enumerate(enum.Next(doc_count) if doc_count else ()):
+                # getattr со значением по умолчанию не перехватывает ошибку
+                # COM: документ, имя которого не читается, пропускается
+                try:
+                    doc_name = win32com.client.Dispatch(item).Name
+                except com_error:
+                    continue
+                if log_info:
+                    logger.info(f"   {i+1}. {doc_name}")
+                index[os.path.normcase(doc_name)] = i
+            self._doc_index = index
+            self._doc_index_count = doc_count
+        return self._doc_index
+
 
 class AutoCADConnectionManager:
     """Менеджер подключений к AutoCAD с fallback-механизмами."""
     
     def __init__(self):
-        # Начинаем с прямого подключения к рабочей версии
-        self.connectors = [
-            DirectAutoCADConnector(),  # Прямое подключение к .25
-            PyAutoCADConnector(),
-            Win32COMConnector(),
-            ComTypesConnector()
+        # Начинаем с прямого подключения к рабочей версии. Хранятся классы:
+        # коннектор создаётся только когда до него дошла очередь
+        self.connector_classes = [
+            DirectAutoCADConnector,  # Прямое подключение к .25
+            PyAutoCADConnector,
+            Win32COMConnector,
+            ComTypesConnector
         ]
+        # Коннектор, сработавший в прошлый раз, пробуется первым
+        self._cached_connector = _read_cache_file(CONNECTOR_CACHE_PATH)
+        self.connector_classes.sort(key=lambda cls: cls.__name__ != self._cached_connector)
         self.active_connector = None
         self.is_connected = False
+        # Объект приложения активного коннектора, не меняется до отключения
+        self._application = None
+        # Время последней успешной проверки доступности AutoCAD (monotonic)
+        self._alive_checked_at: Optional[float] = None
+        # Прерывание перебора коннекторов из другого потока (например, из GUI)
+        self._cancel_event = threading.Event()
+    
+    def cancel(self) -> None:
+        """Прерывание текущего connect() до следующей попытки."""
+        self._cancel_event.set()
+    
+    def _wait(self, delay: float) -> None:
+        """
+        Пауза между коннекторами с обработкой сообщений COM.
+
+        Поток подключения - однопоточный апартамент (STA): пока он спит,
+        входящие вызовы COM не обрабатываются. Поэтому пауза делится на
+        короткие интервалы, между которыми выполняется PumpWaitingMessages.
+        Пауза прерывается вызовом cancel().
+
+        Args:
+            delay: Длительность паузы, сек
+        """
+        try:
+            import pythoncom
+        except ImportError:
+            self._cancel_event.wait(delay)
+            return
+
+        deadline = time.monotonic() + delay
+        while not self._cancel_event.is_set():
+            pythoncom.PumpWaitingMessages()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._cancel_event.wait(min(PUMP_INTERVAL, remaining))
+    
+    def _is_alive(self) -> bool:
+        """
+        Проверка, что подключение ещё действительно (AutoCAD не закрыт).
+
+        Результат успешной проверки действует LIVENESS_TTL секунд. Если
+        AutoCAD недоступен, выполняется отключение.
+
+        Returns:
+            bool: True если подключение можно использовать
+        """
+        if self.active_connector is None or self._application is None or self.active_connector.doc is None:
+            return False
+
+        now = time.monotonic()
+        if self._alive_checked_at is not None and now - self._alive_checked_at < LIVENESS_TTL:
+            return True
+
+        try:
+            self._application.Name
+        except Exception as e:
+            # Тип ошибки COM зависит от коннектора (pywin32 или comtypes)
+            logger.warning(f"⚠️ AutoCAD больше не доступен: {e}")
+            self.disconnect()
+            return False
+
+        self._alive_checked_at = now
+        return True
     
     def connect(self) -> bool:
         """Попытка подключения через все доступные методы."""
+        # Повторный вызов при живом подключении не перебирает коннекторы заново
+        if self.is_connected and self._is_alive():
+            return True
+
         logger.info("🔌 Попытка подключения к AutoCAD...")
+        _ensure_com_initialized()
+        self._cancel_event.clear()
         
-        for i, connector in enumerate(self.connectors):
-            logger.info(f"Попытка {i+1}: {connector.__class__.__name__}")
+        retries = 0
+        log_info = logger.isEnabledFor(logging.INFO)
+        for i, connector_class in enumerate(self.connector_classes, start=1):
+            if self._cancel_event.is_set():
+                logger.warning("⚠️ Подключение к AutoCAD прервано")
+                return False
+
+            if log_info:
+                logger.info(f"Попытка {i}: {connector_class.__name__}")
             
+            connector = connector_class()
+            started = time.monotonic()
             if connector.connect():
                 self.active_connector = connector
+                self._application = connector.acad
                 self.is_connected = True
                 logger.info(f"✅ Успешное подключение через {connector.__class__.__name__}")
+
+                # Следующий запуск начнётся с этого коннектора
+                if connector_class.__name__ != self._cached_connector:
+                    self._cached_connector = connector_class.__name__
+                    _write_cache_file(CONNECTOR_CACHE_PATH, self._cached_connector)
                 return True
             
-            # Небольшая задержка между попытками
-            time.sleep(1)
+            # AutoCAD доступен, но документ не открыт: остальные коннекторы
+            # упрутся в то же самое, повторять перебор бессмысленно
+            if connector.failure is FailureReason.NO_ACTIVE_DOCUMENT:
+                logger.error("❌ AutoCAD запущен, но документ не открыт - откройте .dwg файл в AutoCAD")
+                return False
+
+            if i == len(self.connector_classes):
+                break
+
+            # Пауза нужна, только если COM-сервер отказал сразу и мог не успеть
+            # освободиться: после долгой попытки или при отсутствующей
+            # библиотеке ждать нечего
+            failed_fast = time.monotonic() - started < FAST_FAILURE_THRESHOLD
+            if failed_fast and connector.failure is not None and connector.failure.is_transient:
+                delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retries)
+                retries += 1
+                self._wait(delay)
         
         logger.error("❌ Не удалось подключиться ни одним из методов")
         return False
     
     def get_application(self):
         """Получение объекта приложения AutoCAD."""
-        if self.active_connector:
-            return self.active_connector.get_application()
-        return None
+        return self._application
     
     def get_active_document(self):
         """Получение активного документа."""
-        if self.active_connector:
-            return self.active_connector.get_active_document()
-        return None
+        # Документ меняется при open_document, поэтому читается у коннектора
+        connector = self.active_connector
+        return connector.doc if connector else None
     
     def open_document(self, file_path: str) -> bool:
         """Открытие документа."""
@@ -391,27 +885,25 @@ class AutoCADConnectionManager:
             return self.active_connector.open_document(file_path)
         return False
     
-    def get_connection_info(self) -> Dict[str, Any]:
+    def get_connection_info(self) -> ConnectionInfo:
         """Получение информации о текущем подключении."""
-        if self.active_connector:
-            return {
-                'method': self.active_connector.__class__.__name__,
-                'connected': self.is_connected,
-                'has_application': self.get_application() is not None,
-                'has_document': self.get_active_document() is not None
-            }
-        return {
-            'method': 'None',
-            'connected': False,
-            'has_application': False,
-            'has_document': False
-        }
+        connector = self.active_connector
+        if connector:
+            return ConnectionInfo(
+                method=connector.__class__.__name__,
+                connected=self.is_connected,
+                has_application=self._application is not None,
+                has_document=connector.doc is not None
+            )
+        return NO_CONNECTION
     
     def disconnect(self) -> bool:
         """Отключение от AutoCAD."""
         try:
             if self.active_connector:
                 self.active_connector = None
+            self._application = None
+            self._alive_checked_at = None
             self.is_connected = False
             logger.info("✅ Отключение от AutoCAD")
             return True
@@ -6,13 +6,73 @@
 
 import os
 import time
-from typing import List, Dict, Any, Optional
+import contextlib
+from collections import Counter
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Tuple
 import logging
 
-from autocad_connector import AutoCADConnectionManager
+from .autocad_com import (
+    BLOCK_REFERENCE_DISPIDS,
+    ENTITY_DISPIDS,
+    case_pattern,
+    get_property,
+    iter_batches,
+    read_attributes,
+    selected_entities,
+)
+from .autocad_connector import NO_CONNECTION, AutoCADConnectionManager, ConnectionInfo
 
 logger = logging.getLogger(__name__)
 
+# Набор выбора для поиска вставок блоков
+SELECTION_SET_NAME = 'borehole_velta_blocks'
+
+# Источники ModelSpace в порядке предпочтения: документ обработчика,
+# активный документ, первый открытый документ
+_MODEL_SPACE_SOURCES = (
+    lambda handler: handler.doc.ModelSpace,
+    lambda handler: handler.acad.ActiveDocument.ModelSpace,
+    lambda handler: handler.acad.Documents.Item(0).ModelSpace,
+)
+
+
+class BoreholeBlock(NamedTuple):
+    """Вставка блока скважины, найденная в чертеже."""
+    name: str
+    position: Tuple[float, float, float]
+    layer: str
+    entity_type: str
+    attributes: Dict[str, str]
+
+
+@contextlib.contextmanager
+def _selected_block_references(doc, block_name: str, layer_prefix: str):
+    """
+    Вставки блоков пространства модели с подстрокой block_name в имени
+    на слоях, начинающихся с layer_prefix.
+
+    Args:
+        doc: Документ AutoCAD
+        block_name: Подстрока имени блока
+        layer_prefix: Префикс имени слоя
+
+    Yields:
+        Набор выбора или None, если выборка недоступна - тогда вызывающий
+        код обходит ModelSpace целиком
+    """
+    with contextlib.ExitStack() as stack:
+        try:
+            selection = stack.enter_context(selected_entities(
+                doc,
+                [0, 410, 2, 8],
+                ['INSERT', 'Model', case_pattern(block_name, '*', '*'), case_pattern(layer_prefix, '', '*')],
+                SELECTION_SET_NAME
+            ))
+        except Exception as e:
+            logger.warning(f"⚠️ Выборка вставок не выполнена ({e}), обход всего ModelSpace")
+            selection = None
+        yield selection
+
 
 class AutoCADHandler:
     """Класс для работы с AutoCAD файлами с улучшенным подключением."""
@@ -23,6 +83,39 @@ class AutoCADHandler:
         self.acad = None
         self.doc = None
         self.is_connected = False
+        # ModelSpace и документ, для которого он получен
+        self._model_space = None
+        self._model_space_doc = None
+    
+    def _get_model_space(self):
+        """
+        ModelSpace текущего документа. Свойство запрашивается через COM один
+        раз на документ; после смены self.doc запрашивается заново.
+
+        Если ModelSpace документа недоступен, используется ModelSpace
+        активного документа, затем первого открытого.
+
+        Returns:
+            Пространство модели текущего документа или None
+        """
+        if self._model_space is None or self._model_space_doc is not self.doc:
+            # Источники перебираются всегда с первого: удачный запасной не
+            # запоминается, иначе после смены документа вернулся бы ModelSpace
+            # другого чертежа. Тип ошибки COM зависит от коннектора (pywin32
+            # или comtypes), поэтому перехватывается Exception - но не
+            # KeyboardInterrupt
+            for source in _MODEL_SPACE_SOURCES:
+                try:
+                    model_space = source(self)
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                logger.error(f"❌ Не удалось получить ModelSpace: {error}")
+                return None
+            self._model_space = model_space
+            self._model_space_doc = self.doc
+        return self._model_space
     
     def connect(self) -> bool:
         """
@@ -40,7 +133,7 @@ class AutoCADHandler:
             
             # Получаем информацию о подключении
             conn_info = self.connection_manager.get_connection_info()
-            logger.info(f"✅ Подключение успешно через: {conn_info['method']}")
+            logger.info(f"✅ Подключение успешно через: {conn_info.method}")
             return True
         else:
             logger.error("❌ Не удалось подключиться к AutoCAD ни одним из методов")
@@ -80,6 +173,9 @@ class AutoCADHandler:
     def get_all_entities(self) -> List[Any]:
         """
         Получение всех объектов из текущего документа.
+
+        При подключении через pywin32 объекты возвращаются как PyIDispatch
+        без обёрток (см. autocad_com.iter_batches).
         
         Returns:
             List[Any]: Список всех объектов в документе
@@ -89,16 +185,21 @@ class AutoCADHandler:
             return []
         
         try:
+            # Объекты запрашиваются пачками, а не по одному вызову COM на объект
+            model_space = self._get_model_space()
+            if model_space is None:
+                return []
+
             entities = []
-            for entity in self.doc.ModelSpace:
-                entities.append(entity)
+            for batch in iter_batches(model_space):
+                entities.extend(batch)
             logger.info(f"Найдено {len(entities)} объектов в документе")
             return entities
         except Exception as e:
             logger.error(f"Ошибка получения объектов: {e}")
             return []
     
-    def find_borehole_blocks(self, block_name: str = "скважина", layer_prefix: str = "СКВ") -> List[Dict[str, Any]]:
+    def find_borehole_blocks(self, block_name: str = "скважина", layer_prefix: str = "СКВ") -> List[BoreholeBlock]:
         """
         Поиск всех вставок блоков с именем "скважина" на слоях, начинающихся с "СКВ".
 
@@ -107,92 +208,126 @@ class AutoCADHandler:
             layer_prefix: Префикс слоя (по умолчанию "СКВ")
 
         Returns:
-            List[Dict[str, Any]]: Список словарей с информацией о каждой вставке блока
+            List[BoreholeBlock]: Список найденных вставок блока
+        """
+        return list(self.iter_borehole_blocks(block_name, layer_prefix))
+    
+    def iter_borehole_blocks(self, block_name: str = "скважина", layer_prefix: str = "СКВ") -> Iterator[BoreholeBlock]:
+        """
+        Поиск вставок блоков "скважина" с выдачей записей по мере нахождения.
+
+        Записи не накапливаются в списке: вызывающий код может обрабатывать
+        их по одной. Набор выбора удаляется, когда генератор исчерпан или закрыт.
+
+        Args:
+            block_name: Имя блока для поиска (по умолчанию "скважина")
+            layer_prefix: Префикс слоя (по умолчанию "СКВ")
+
+        Yields:
+            BoreholeBlock: Найденная вставка блока
         """
         if not self.is_connected or not self.doc:
             logger.error("Нет активного документа")
-            return []
+            return
 
-        boreholes = []
+        found_count = 0
         processed_count = 0
         skipped_layers = 0
+        # Ошибки чтения объектов по типу исключения - выводятся одной строкой
+        # после прохода, а не на каждый объект
+        error_counts = Counter()
+        first_error = None
+        # Образцы для сравнения приводятся к регистру один раз, а не на каждый объект
+        block_name_lower = block_name.lower()
+        layer_prefix_upper = layer_prefix.upper()
+        # Уровень логирования проверяется один раз: при отключённом INFO
+        # прогресс и примеры не проверяются на каждом объекте
+        log_info = logger.isEnabledFor(logging.INFO)
 
         try:
             logger.info(f"🔍 Поиск вставок блока '{block_name}' на слоях, начинающихся с '{layer_prefix}'...")
             start_time = time.time()
 
-            model_space = None
-            try:
-                model_space = self.doc.ModelSpace
-            except:
-                try:
-                    model_space = self.acad.ActiveDocument.ModelSpace
-                except:
-                    try:
-                        model_space = self.acad.Documents.Item(0).ModelSpace
-                    except Exception as e:
-                        logger.error(f"❌ Не удалось получить ModelSpace: {e}")
-                        return []
+            # Отбор вставок по имени блока и слою выполняет AutoCAD; если набор выбора
+            # недоступен, обходится всё пространство модели. ModelSpace
+            # запрашивается только в этом случае
+            with _selected_block_references(self.doc, block_name, layer_prefix) as selection:
+                entities = selection
+                # В наборе выбора только вставки блоков (DXF INSERT) - тип
+                # известен заранее и не читается у каждого объекта
+                known_type = 'AcDbBlockReference'
+                if entities is None:
+                    entities = self._get_model_space()
+                    if entities is None:
+                        return
+                    known_type = None
+                # Объекты запрашиваются пачками через IEnumVARIANT::Next, а не
+                # по одному вызову COM на объект
+                for batch in iter_batches(entities):
+                    for entity in batch:
+                        try:
+                            # Тип читается один раз и используется и для отбора, и в записи
+                            entity_type = known_type or get_property(entity, 'EntityName', ENTITY_DISPIDS)
+                            if entity_type == 'AcDbBlockReference':
+                                # Свойства читаются по DISPID, без приведения
+                                # вставки к IAcadBlockReference
+                                entity_name = get_property(entity, 'Name', BLOCK_REFERENCE_DISPIDS).lower()
 
-            if model_space is None:
-                logger.error("❌ ModelSpace не получен")
-                return []
+                                if block_name_lower in entity_name:
+                                    entity_layer = get_property(entity, 'Layer', BLOCK_REFERENCE_DISPIDS)
 
-            for entity in model_space:
-                processed_count += 1
+                                    # Фильтруем по префиксу слоя
+                                    if not entity_layer.upper().startswith(layer_prefix_upper):
+                                        skipped_layers += 1
+                                        continue
 
-                if processed_count % 1000 == 0:
-                    elapsed = time.time() - start_time
-                    logger.info(f"📊 Обработано {processed_count} объектов, найдено {len(boreholes)} скважин за {elapsed:.1f} сек...")
+                                    # Массив из трёх double приходит кортежем и распаковывается
+                                    # сразу, без повторной индексации
+                                    x, y, z = get_property(entity, 'InsertionPoint', BLOCK_REFERENCE_DISPIDS)
 
-                try:
-                    if entity.EntityName == 'AcDbBlockReference':
-                        entity_name = getattr(entity, 'Name', '').lower()
-
-                        if block_name.lower() in entity_name:
-                            entity_layer = getattr(entity, 'Layer', 'Unknown')
-
-                            # Фильтруем по префиксу слоя
-                            if not entity_layer.upper().startswith(layer_prefix.upper()):
-                                skipped_layers += 1
-                                continue
-
-                            insertion_point = entity.InsertionPoint
-
-                            attributes = {}
-                            try:
-                                if hasattr(entity, 'GetAttributes'):
-                                    attrs = entity.GetAttributes()
-                                    for attr in attrs:
-                                        tag = getattr(attr, 'TagString', '')
-                                        value = getattr(attr, 'TextString', '')
-                                        attributes[tag] = value
-                            except:
-                                pass
-
-                            borehole_data = {
-                                'name': entity_name,
-                                'position': (insertion_point[0], insertion_point[1], insertion_point[2]),
-                                'layer': entity_layer,
-                                'entity_type': entity.EntityName,
-                                'attributes': attributes
-                            }
-                            boreholes.append(borehole_data)
-
-                            if len(boreholes) <= 10:
-                                logger.info(f"🕳️ Вставка #{len(boreholes)}: блок '{entity_name}' на слое '{entity_layer}', позиция ({insertion_point[0]:.2f}, {insertion_point[1]:.2f}, {insertion_point[2]:.2f}), атрибуты: {attributes}")
+                                    # GetAttributes возвращает пустой массив у блока без
+                                    # атрибутов - отдельная проверка HasAttributes не нужна
+                                    attributes = read_attributes(entity)
 
-                except Exception as e:
-                    continue
+                                    borehole_data = BoreholeBlock(
+                                        entity_name,
+                                        (x, y, z),
+                                        entity_layer,
+                                        entity_type,
+                                        attributes
+                                    )
+                                    found_count += 1
+
+                                    if log_info and found_count <= 10:
+                                        logger.info(f"🕳️ Вставка #{found_count}: блок '{entity_name}' на слое '{entity_layer}', позиция ({x:.2f}, {y:.2f}, {z:.2f}), атрибуты: {attributes}")
+
+                                    yield borehole_data
+
+                        except Exception as e:
+                            error_counts[type(e).__name__] += 1
+                            if first_error is None:
+                                first_error = e
+                            continue
+
+                    # Прогресс выводится раз на пачку, а не проверяется на каждом объекте
+                    processed_count += len(batch)
+                    if log_info:
+                        elapsed = time.time() - start_time
+                        logger.info(f"📊 Обработано {processed_count} объектов, найдено {found_count} скважин за {elapsed:.1f} сек...")
+
+            if error_counts:
+                logger.warning(f"⚠️ Пропущено {sum(error_counts.values())} объектов из-за ошибок чтения: "
+                               f"{dict(error_counts)} (первая: {first_error})")
 
             elapsed_total = time.time() - start_time
-            logger.info(f"✅ Найдено {len(boreholes)} вставок блока '{block_name}' из {processed_count} обработанных объектов за {elapsed_total:.1f} сек")
-            logger.info(f"📋 Пропущено {skipped_layers} блоков на других слоях")
-            return boreholes
+            logger.info(f"✅ Найдено {found_count} вставок блока '{block_name}' из {processed_count} обработанных объектов за {elapsed_total:.1f} сек")
+            # Вставки на других слоях отсекает набор выбора; счётчик
+            # ненулевой только при обходе всего ModelSpace
+            if skipped_layers:
+                logger.info(f"📋 Пропущено {skipped_layers} блоков на других слоях")
 
         except Exception as e:
             logger.error(f"Ошибка поиска блоков скважин: {e}")
-            return []
     
     def close_document(self) -> bool:
         """
@@ -238,21 +373,16 @@ class AutoCADHandler:
             logger.error(f"Ошибка отключения от AutoCAD: {e}")
             return False
     
-    def get_connection_info(self) -> Dict[str, Any]:
+    def get_connection_info(self) -> ConnectionInfo:
         """
         Получение информации о текущем подключении.
         
         Returns:
-            Dict[str, Any]: Информация о подключении
+            ConnectionInfo: Информация о подключении
         """
         if self.connection_manager:
             return self.connection_manager.get_connection_info()
-        return {
-            'method': 'None',
-            'connected': False,
-            'has_application': False,
-            'has_document': False
-        }
+        return NO_CONNECTION
     
     def get_layers_info(self) -> List[Dict[str, Any]]:
         """
@@ -266,6 +396,8 @@ class AutoCADHandler:
             return []
         
         layers_info = []
+        error_counts = Counter()
+        first_error = None
         
         try:
             logger.info("🔍 Получение информации о слоях...")
@@ -284,9 +416,15 @@ class AutoCADHandler:
                     }
                     layers_info.append(layer_info)
                 except Exception as e:
-                    logger.warning(f"Ошибка получения информации о слое {i}: {e}")
+                    error_counts[type(e).__name__] += 1
+                    if first_error is None:
+                        first_error = (i, e)
                     continue
             
+            if error_counts:
+                logger.warning(f"Не удалось получить информацию о {sum(error_counts.values())} слоях: "
+                               f"{dict(error_counts)} (первая: слой {first_error[0]}: {first_error[1]})")
+            
             logger.info(f"✅ Получена информация о {len(layers_info)} слоях")
             return layers_info
             
@@ -6,9 +6,13 @@
 import re
 import random
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    # Только для аннотаций: обработчик AutoCAD тянет за собой привязки COM
+    from .autocad_handler import BoreholeBlock
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,7 +43,7 @@ class BoreholeProcessor:
             r'^(\d+)$',               # просто число
         ]
     
-    def extract_borehole_from_blocks(self, borehole_blocks: List[Dict[str, Any]]) -> List[Borehole]:
+    def extract_borehole_from_blocks(self, borehole_blocks: List['BoreholeBlock']) -> List[Borehole]:
         """
         Извлечение скважин из вставок блоков AutoCAD.
 
@@ -52,8 +56,8 @@ class BoreholeProcessor:
         self.boreholes = []
 
         for idx, block in enumerate(borehole_blocks):
-            position = block['position']
-            attributes = block.get('attributes', {})
+            position = block.position
+            attributes = block.attributes
 
             # Пытаемся найти номер скважины в атрибутах
             borehole_number = None
@@ -9,12 +9,19 @@ import logging
 import argparse
 from typing import Optional
 
-# Добавляем текущую директорию в путь для импорта модулей
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+if __package__:
+    from .autocad_handler import AutoCADHandler
+    from .borehole_processor import BoreholeProcessor
+    from .console_output import ConsoleOutput
+else:
+    # Запуск как скрипта (python src/main.py): модули импортируются из пакета
+    # src, как и в диагностических скриптах, чтобы в процессе была одна копия
+    # каждого модуля
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from autocad_handler import AutoCADHandler
-from borehole_processor import BoreholeProcessor
-from console_output import ConsoleOutput
+    from src.autocad_handler import AutoCADHandler
+    from src.borehole_processor import BoreholeProcessor
+    from src.console_output import ConsoleOutput
 
 
 def setup_logging(level: str = "INFO") -> None:
@@ -0,0 +1,163 @@
+"""
+Тесты общих COM-функций на объектах, имитирующих comtypes (pyautocad).
+Запуск: python -m unittest discover tests
+"""
+
+import unittest
+
+from src.autocad_com import (
+    ENTITY_DISPIDS,
+    get_property,
+    iter_batches,
+    read_attributes,
+    select_all,
+)
+
+
+class FakeCOMError(Exception):
+    """Аналог comtypes.COMError: не наследуется от AttributeError."""
+
+
+class FakeEnumVARIANT:
+    """IEnumVARIANT comtypes: Next(1) возвращает пару (объект, число полученных)."""
+
+    def __init__(self, items):
+        self._items = list(items)
+        self.calls = []
+
+    def Next(self, celt):
+        self.calls.append(celt)
+        batch, self._items = self._items[:celt], self._items[celt:]
+        if celt == 1:
+            return (batch[0], 1) if batch else (None, 0)
+        return batch
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item, fetched = self.Next(1)
+        if not fetched:
+            raise StopIteration
+        return item
+
+
+class FakeDynamicDispatch:
+    """
+    Динамический объект comtypes: неизвестное имя ищется через
+    GetIDsOfNames и приводит к COMError, а не к AttributeError.
+    """
+
+    def __init__(self, items=(), **properties):
+        self.__dict__['_comobj'] = object()
+        self.__dict__['_properties'] = properties
+        self.__dict__['_items'] = list(items)
+        self.__dict__['enum'] = None
+        self.__dict__['select_calls'] = []
+
+    def __getattr__(self, name):
+        try:
+            return self._properties[name]
+        except KeyError:
+            raise FakeCOMError(f'Unknown name: {name}') from None
+
+    def __iter__(self):
+        self.__dict__['enum'] = FakeEnumVARIANT(self._items)
+        return self.enum
+
+    def Select(self, mode, *args, **kwargs):
+        self.select_calls.append((mode, args, kwargs))
+
+
+class PyIDispatch:
+    """Интерфейс IDispatch pywin32: члены доступны только по DISPID."""
+
+    def __init__(self, **members):
+        # Имя члена -> (DISPID, значение)
+        self._members = members
+
+    def GetIDsOfNames(self, name):
+        return self._members[name][0]
+
+    def Invoke(self, dispid, lcid, flags, result):
+        values = {member_id: value for member_id, value in self._members.values()}
+        return values[dispid]
+
+
+class ComtypesObjectsTest(unittest.TestCase):
+    """Объекты comtypes проходят по ветке comtypes без проверки _oleobj_."""
+
+    def test_iter_batches_uses_enum_next(self):
+        collection = FakeDynamicDispatch(items=range(5))
+
+        batches = list(iter_batches(collection, batch_size=2))
+
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+        self.assertEqual(collection.enum.calls, [2, 2, 2, 2])
+
+    def test_iter_batches_single_item_unpacks_pair(self):
+        collection = FakeDynamicDispatch(items=['a', 'b'])
+
+        batches = list(iter_batches(collection, batch_size=1))
+
+        self.assertEqual(batches, [['a'], ['b']])
+        self.assertEqual(collection.enum.calls, [1, 1, 1])
+
+    def test_get_property_reads_attribute(self):
+        entity = FakeDynamicDispatch(Layer='СКВ', EntityName='AcDbBlockReference')
+
+        self.assertEqual(get_property(entity, 'Layer', ENTITY_DISPIDS), 'СКВ')
+        self.assertEqual(get_property(entity, 'EntityName', ENTITY_DISPIDS), 'AcDbBlockReference')
+
+    def test_read_attributes(self):
+        attrs = [FakeDynamicDispatch(TagString='НОМЕР', TextString='12'),
+                 FakeDynamicDispatch(TagString='ОТМ', TextString='105.3')]
+        entity = FakeDynamicDispatch(GetAttributes=lambda: attrs)
+
+        self.assertEqual(read_attributes(entity), {'НОМЕР': '12', 'ОТМ': '105.3'})
+
+    def test_select_all_passes_filter_keywords(self):
+        selection = FakeDynamicDispatch()
+
+        select_all(selection, [0, 8], ['INSERT', 'СКВ'])
+
+        ((mode, args, kwargs),) = selection.select_calls
+        self.assertEqual(mode, 5)
+        self.assertEqual(args, ())
+        self.assertEqual(list(kwargs['FilterType']), [0, 8])
+        self.assertEqual(kwargs['FilterData'], ['INSERT', 'СКВ'])
+
+
+class Pywin32ObjectsTest(unittest.TestCase):
+    """Объекты pywin32 читаются по DISPID из кэша своего интерфейса."""
+
+    def test_get_property_caches_dispid_per_interface(self):
+        # Name у вставки блока и у листа - члены разных интерфейсов
+        block = PyIDispatch(Name=(1, 'скважина'))
+        layout = PyIDispatch(Name=(7, 'Лист1'), Layer=(1, '0'))
+        block_dispids, layout_dispids = {}, {}
+
+        self.assertEqual(get_property(block, 'Name', block_dispids), 'скважина')
+        self.assertEqual(get_property(layout, 'Name', layout_dispids), 'Лист1')
+        self.assertEqual(block_dispids, {'Name': 1})
+        self.assertEqual(layout_dispids, {'Name': 7})
+
+    def test_read_attributes_uses_attribute_interface(self):
+        # TagString и TextString - члены атрибута, а не вставки блока
+        attrs = (PyIDispatch(TagString=(3, 'НОМЕР'), TextString=(4, '12')),
+                 PyIDispatch(TagString=(3, 'ОТМ'), TextString=(4, '105.3')))
+        block = PyIDispatch(GetAttributes=(9, attrs), TagString=(5, 'ТЕГ'), TextString=(6, ''))
+
+        self.assertEqual(read_attributes(block), {'НОМЕР': '12', 'ОТМ': '105.3'})
+
+
+class PlainIterablesTest(unittest.TestCase):
+    """Обычные коллекции Python перебираются пачками без COM."""
+
+    def test_iter_batches_list(self):
+        self.assertEqual(list(iter_batches(list('abcde'), batch_size=2)),
+                         [['a', 'b'], ['c', 'd'], ['e']])
+
+
+if __name__ == '__main__':
+    unittest.main()